@@ -1,2 +1,4 @@
-from endorser.converter import DocumentConverter, ConversionError
+from endorser.converter import DocumentConverter, ConversionError, \
+    BatchResult
 from endorser.schema import Schema
+from endorser.factory import SchemaFactory
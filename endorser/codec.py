@@ -0,0 +1,411 @@
+import array
+import decimal
+import hashlib
+import operator
+import pickle
+import struct
+import uuid
+from itertools import repeat
+from typing import Iterator, Type, TypeVar
+
+from endorser.common import is_optional, is_typing_list
+from endorser.schema import Schema, schema_type
+
+T = TypeVar('T', bound=Schema)
+
+_LENGTH = struct.Struct('<I')
+_FINGERPRINT_SIZE = 8
+# struct formats of the types which are stored with a fixed size
+_FIXED_FORMATS = {int: 'q', float: 'd', bool: '?'}
+
+
+class SchemaCodec:
+    """
+    Compact binary encoding of the objects of a `Schema` class.
+
+    The layout of the records is compiled from the type hints once: every
+    record starts with the fingerprint of the class definition and a bitmap
+    of the None fields, followed by the fixed size fields (int, float, bool)
+    packed together and the rest of the fields in declaration order. Field
+    names and types aren't stored, and decoding doesn't run any validation.
+    Attributes which aren't type hinted on the class aren't stored.
+    """
+
+    def __init__(self, schema: Type[T]):
+        """
+        :param schema: the Schema class to encode and decode
+        """
+        if '_processed' not in schema.__dict__:
+            schema._process()
+        self.schema = schema
+        self.fingerprint = hashlib.blake2b(
+            _describe(schema, set()).encode(),
+            digest_size=_FINGERPRINT_SIZE).digest()
+
+        self._names = list(schema._type_hints)
+        self._bitmap_size = (len(self._names) + 7) // 8
+        self._no_nulls = bytes(self._bitmap_size)
+        self._fixed_formats = []
+        self._fixed_indices = []
+        self._variable = []
+        for i, name in enumerate(self._names):
+            type_hint = _unwrap_optional(schema._type_hints[name])
+            if type_hint in _FIXED_FORMATS:
+                self._fixed_formats.append(_FIXED_FORMATS[type_hint])
+                self._fixed_indices.append(i)
+            else:
+                self._variable.append((i, *_value_codec(type_hint)))
+        self._fixed = struct.Struct('<' + ''.join(self._fixed_formats))
+        self._values = _tuple_getter(operator.attrgetter, self._names)
+        self._fixed_values = _tuple_getter(operator.itemgetter,
+                                           self._fixed_indices)
+
+    def encode(self, obj: T) -> bytes:
+        """
+        :param obj: the object to encode
+        :return: the encoded record
+        """
+        out = bytearray(self.fingerprint)
+        self._encode_into(obj, out)
+        return bytes(out)
+
+    def decode(self, buffer) -> T:
+        """
+        :param buffer: the encoded record, any object supporting the buffer
+            protocol, e.g. bytes, memoryview or mmap
+        :return: the decoded object
+        """
+        obj, offset = self.decode_from(buffer)
+        if offset != len(memoryview(buffer)):
+            raise ValueError('unexpected data after the end of the record')
+        return obj
+
+    def decode_from(self, buffer, offset: int = 0):
+        """
+        Decodes a record starting at the offset, without copying the buffer.
+
+        :param buffer: the buffer containing the record
+        :param offset: the position of the record in the buffer
+        :return: the decoded object and the position after the record
+        """
+        buffer = memoryview(buffer)
+        end = offset + _FINGERPRINT_SIZE
+        if buffer[offset:end] != self.fingerprint:
+            raise ValueError('the record was not encoded from the current '
+                             'definition of %s' % self.schema.__name__)
+        return self._decode_from(buffer, end)
+
+    def iter_decode(self, buffer) -> Iterator[T]:
+        """
+        Lazily decodes the records stored one after the other in the buffer.
+
+        :param buffer: the buffer containing the records, e.g. an mmap
+        :return: the decoded objects
+        """
+        buffer = memoryview(buffer)
+        offset = 0
+        while offset < len(buffer):
+            obj, offset = self.decode_from(buffer, offset)
+            yield obj
+
+    def _encode_into(self, obj: T, out: bytearray):
+        values = self._values(obj)
+        try:
+            if not any(map(operator.is_, values, repeat(None))):
+                out += self._no_nulls
+                out += self._fixed.pack(*self._fixed_values(values))
+                for i, encoder, _ in self._variable:
+                    encoder(values[i], out)
+                return
+
+            bitmap = 0
+            for i, value in enumerate(values):
+                if value is None:
+                    bitmap |= 1 << i
+            out += bitmap.to_bytes(self._bitmap_size, 'little')
+            out += self._fixed.pack(*[0 if values[i] is None else values[i]
+                                      for i in self._fixed_indices])
+            for i, encoder, _ in self._variable:
+                if values[i] is not None:
+                    encoder(values[i], out)
+        except struct.error as e:
+            raise ValueError('%s of %s cannot be encoded: %s' % (
+                self._invalid_field(values), self.schema.__name__, e)) \
+                from None
+
+    def _invalid_field(self, values: tuple) -> str:
+        """
+        :return: the name of the first field whose value doesn't fit its
+            encoding, e.g. an int out of the 64 bit range
+        """
+        for i, format_ in zip(self._fixed_indices, self._fixed_formats):
+            try:
+                struct.pack('<' + format_,
+                            0 if values[i] is None else values[i])
+            except struct.error:
+                return self._names[i]
+        for i, encoder, _ in self._variable:
+            try:
+                if values[i] is not None:
+                    encoder(values[i], bytearray())
+            except struct.error:
+                return self._names[i]
+        return None
+
+    def _decode_from(self, buffer: memoryview, offset: int):
+        bitmap = int.from_bytes(buffer[offset:offset + self._bitmap_size],
+                                'little')
+        offset += self._bitmap_size
+        values = [None] * len(self._names)
+        fixed = self._fixed.unpack_from(buffer, offset)
+        offset += self._fixed.size
+        for i, value in zip(self._fixed_indices, fixed):
+            values[i] = value
+        if bitmap:
+            for i, _, decoder in self._variable:
+                if not bitmap >> i & 1:
+                    values[i], offset = decoder(buffer, offset)
+            for i in range(len(values)):
+                if bitmap >> i & 1:
+                    values[i] = None
+        else:
+            for i, _, decoder in self._variable:
+                values[i], offset = decoder(buffer, offset)
+
+        # the class is already processed, skip Schema.__new__
+        obj = object.__new__(self.schema)
+        obj.__dict__ = dict(zip(self._names, values))
+        return obj, offset
+
+
+def codec_for(schema: Type[T]) -> SchemaCodec:
+    """
+    :param schema: the Schema class
+    :return: the codec of the class, compiled only once and stored on the
+        class, so it doesn't keep classes alive which are otherwise unused
+    """
+    try:
+        return schema.__dict__['_codec']
+    except KeyError:
+        codec = schema._codec = SchemaCodec(schema)
+        return codec
+
+
+def encode(obj: Schema) -> bytes:
+    """
+    :param obj: the object to encode
+    :return: the encoded record
+    """
+    return codec_for(type(obj)).encode(obj)
+
+
+def decode(buffer, schema: Type[T]) -> T:
+    """
+    :param buffer: the encoded record
+    :param schema: the Schema class of the record
+    :return: the decoded object
+    """
+    return codec_for(schema).decode(buffer)
+
+
+def _tuple_getter(getter, keys: list):
+    """
+    :return: the getter of the keys, which always returns a tuple
+    """
+    if not keys:
+        return lambda obj: ()
+    if len(keys) == 1:
+        get = getter(keys[0])
+        return lambda obj: (get(obj),)
+    return getter(*keys)
+
+
+def _unwrap_optional(type_hint):
+    if is_optional(type_hint):
+        return type_hint.__args__[0]
+    return type_hint
+
+
+def _describe(type_hint, seen: set) -> str:
+    """
+    :return: a description of the type hint, including the fields of every
+        Schema class it refers to
+    """
+    schema = schema_type(type_hint)
+    if schema and not is_optional(type_hint):
+        name = '%s.%s' % (schema.__module__, schema.__qualname__)
+        if schema in seen:
+            return name
+        seen.add(schema)
+        if '_processed' not in schema.__dict__:
+            schema._process()
+        return '%s(%s)' % (name, ','.join(
+            '%s:%s' % (field, _describe(hint, seen))
+            for field, hint in schema._type_hints.items()))
+    if is_optional(type_hint):
+        return 'Optional[%s]' % _describe(type_hint.__args__[0], seen)
+    if is_typing_list(type_hint):
+        return 'List[%s]' % _describe(type_hint.__args__[0], seen)
+    return repr(type_hint)
+
+
+def _value_codec(type_hint):
+    """
+    :param type_hint: the type hint of the values
+    :return: the encoder and the decoder of the values
+    """
+    if type_hint in _FIXED_FORMATS:
+        return _struct_codec(struct.Struct('<' + _FIXED_FORMATS[type_hint]))
+    if type_hint is str:
+        return _encode_str, _decode_str
+    if type_hint is bytes:
+        return _encode_bytes, _decode_bytes
+    if type_hint is uuid.UUID:
+        return _encode_uuid, _decode_uuid
+    if type_hint is decimal.Decimal:
+        return _encode_decimal, _decode_decimal
+    schema = schema_type(type_hint)
+    if schema:
+        return _schema_codec(schema)
+    if is_typing_list(type_hint):
+        element_type = type_hint.__args__[0]
+        if element_type in _FIXED_FORMATS:
+            return _numeric_list_codec(_FIXED_FORMATS[element_type])
+        if is_optional(element_type):
+            return _list_codec(*_optional_codec(
+                *_value_codec(element_type.__args__[0])))
+        return _list_codec(*_value_codec(element_type))
+    return _encode_pickle, _decode_pickle
+
+
+def _struct_codec(format_: struct.Struct):
+    def encoder(value, out):
+        out += format_.pack(value)
+
+    def decoder(buffer, offset):
+        return format_.unpack_from(buffer, offset)[0], offset + format_.size
+
+    return encoder, decoder
+
+
+def _encode_bytes(value: bytes, out: bytearray):
+    out += _LENGTH.pack(len(value))
+    out += value
+
+
+def _decode_bytes(buffer: memoryview, offset: int):
+    size = _LENGTH.unpack_from(buffer, offset)[0]
+    offset += _LENGTH.size
+    return buffer[offset:offset + size].tobytes(), offset + size
+
+
+def _encode_str(value: str, out: bytearray):
+    _encode_bytes(value.encode('utf-8'), out)
+
+
+def _decode_str(buffer: memoryview, offset: int):
+    size = _LENGTH.unpack_from(buffer, offset)[0]
+    offset += _LENGTH.size
+    return str(buffer[offset:offset + size], 'utf-8'), offset + size
+
+
+def _encode_uuid(value: uuid.UUID, out: bytearray):
+    out += value.bytes
+
+
+def _decode_uuid(buffer: memoryview, offset: int):
+    return uuid.UUID(bytes=buffer[offset:offset + 16].tobytes()), offset + 16
+
+
+def _encode_decimal(value: decimal.Decimal, out: bytearray):
+    _encode_str(str(value), out)
+
+
+def _decode_decimal(buffer: memoryview, offset: int):
+    value, offset = _decode_str(buffer, offset)
+    return decimal.Decimal(value), offset
+
+
+def _schema_codec(schema):
+    # the codec of the nested class is looked up when it's first used, so
+    # self-referencing classes don't compile forever
+    def encoder(value, out):
+        codec_for(schema)._encode_into(value, out)
+
+    def decoder(buffer, offset):
+        return codec_for(schema)._decode_from(buffer, offset)
+
+    return encoder, decoder
+
+
+def _numeric_list_codec(typecode: str):
+    """
+    Packs lists of numbers with a single struct call. `array.array` values
+    are restored as arrays.
+    """
+
+    def encoder(value, out):
+        out += b'\x01' if type(value) is array.array else b'\x00'
+        out += _LENGTH.pack(len(value))
+        out += struct.pack('<%d%s' % (len(value), typecode), *value)
+
+    def decoder(buffer, offset):
+        is_array = buffer[offset]
+        size = _LENGTH.unpack_from(buffer, offset + 1)[0]
+        offset += 1 + _LENGTH.size
+        format_ = struct.Struct('<%d%s' % (size, typecode))
+        values = format_.unpack_from(buffer, offset)
+        offset += format_.size
+        if is_array:
+            return array.array(typecode, values), offset
+        return list(values), offset
+
+    return encoder, decoder
+
+
+def _optional_codec(value_encoder, value_decoder):
+    """
+    Prefixes the values with a byte telling whether they are None.
+    """
+
+    def encoder(value, out):
+        if value is None:
+            out += b'\x00'
+        else:
+            out += b'\x01'
+            value_encoder(value, out)
+
+    def decoder(buffer, offset):
+        if not buffer[offset]:
+            return None, offset + 1
+        return value_decoder(buffer, offset + 1)
+
+    return encoder, decoder
+
+
+def _list_codec(element_encoder, element_decoder):
+    def encoder(value, out):
+        out += _LENGTH.pack(len(value))
+        for element in value:
+            element_encoder(element, out)
+
+    def decoder(buffer, offset):
+        size = _LENGTH.unpack_from(buffer, offset)[0]
+        offset += _LENGTH.size
+        values = []
+        for _ in range(size):
+            value, offset = element_decoder(buffer, offset)
+            values.append(value)
+        return values, offset
+
+    return encoder, decoder
+
+
+def _encode_pickle(value, out: bytearray):
+    _encode_bytes(pickle.dumps(value, pickle.HIGHEST_PROTOCOL), out)
+
+
+def _decode_pickle(buffer: memoryview, offset: int):
+    size = _LENGTH.unpack_from(buffer, offset)[0]
+    offset += _LENGTH.size
+    return pickle.loads(buffer[offset:offset + size]), offset + size
@@ -1,11 +1,84 @@
+import datetime
+import decimal
+import enum
 import platform
+import re
 import typing
+import uuid
 
 _VERSION = platform.python_version().split(".")
 _PY37 = _VERSION[0] is '3' and _VERSION[1] is '7'
 _GENERIC_PARENT = typing._GenericAlias if _PY37 else typing.GenericMeta
 _OPTIONAL_PARENT = typing._GenericAlias if _PY37 else typing._Union
 
+# `array.array` typecodes used to store homogeneous numeric lists compactly
+ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+# source types which can be coerced to the hinted type and the builtin
+# constructor doing the coercion
+_COERCERS = {
+    int: ((str,), int),
+    float: ((int, str), float),
+    decimal.Decimal: ((int, str), decimal.Decimal),
+    uuid.UUID: ((str,), uuid.UUID),
+}
+
+_ISO_DATETIME = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?'
+    r'(?:([+-])(\d{2}):(\d{2}))?)?$')
+
+
+def _datetime_from_iso(value: str) -> datetime.datetime:
+    """
+    Parses the ISO format strings `datetime.fromisoformat` of Python 3.7+
+    parses, e.g. '2020-01-02T03:04:05.123+01:00'.
+    """
+    match = _ISO_DATETIME.match(value)
+    if not match:
+        raise ValueError('invalid isoformat string: %r' % value)
+    year, month, day, hour, minute, second, fraction, sign, offset_hours, \
+        offset_minutes = match.groups()
+    tzinfo = None
+    if sign:
+        offset = datetime.timedelta(hours=int(offset_hours),
+                                    minutes=int(offset_minutes))
+        tzinfo = datetime.timezone(-offset if sign == '-' else offset)
+    return datetime.datetime(int(year), int(month), int(day), int(hour or 0),
+                             int(minute or 0), int(second or 0),
+                             int((fraction or '0').ljust(6, '0')),
+                             tzinfo=tzinfo)
+
+
+def _date_from_iso(value: str) -> datetime.date:
+    """
+    Parses 'YYYY-MM-DD' strings like `date.fromisoformat` of Python 3.7+.
+    """
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+# ISO format parsing is only built in from Python 3.7
+_COERCERS[datetime.datetime] = (str,), getattr(
+    datetime.datetime, 'fromisoformat', _datetime_from_iso)
+_COERCERS[datetime.date] = (str,), getattr(
+    datetime.date, 'fromisoformat', _date_from_iso)
+
+
+def resolve_type_hints(cls):
+    """
+    Resolves the type hints of a class, including forward references. The
+    class can reference itself even if it isn't defined at module level.
+
+    :param cls: the class to resolve the type hints of
+    :return: the resolved type hints
+    :raises NameError: if a forward reference cannot be resolved
+    """
+    try:
+        return typing.get_type_hints(cls, localns={cls.__name__: cls})
+    except NameError as e:
+        raise NameError("cannot resolve the type hints of '%s': %s"
+                        % (cls.__name__, e)) from e
+
 
 def is_optional(attribute_type):
     """
@@ -26,6 +99,18 @@ def is_optional(attribute_type):
     return False
 
 
+def is_union(attribute_type):
+    """
+    Checks whether the attribute is hinted with a typing.Union of more than
+    one type besides None.
+
+    :param attribute_type: the attribute to check
+    :return: whether the attribute is hinted with typing.Union
+    """
+    return getattr(attribute_type, '__origin__', None) is typing.Union \
+        and not is_optional(attribute_type)
+
+
 def is_typing_list(attribute_type):
     """
     Checks whether the attribute is hinted with typing.List.
@@ -40,3 +125,56 @@ def is_typing_list(attribute_type):
         elif not _PY37 and issubclass(attribute_type, list):
             result = True
     return result
+
+
+def runtime_types(type_hints) -> tuple:
+    """
+    Collects the classes values of the type hints can be checked against
+    with `isinstance`. Generic type hints like typing.List[int] are checked
+    against their origin class.
+
+    :param type_hints: the type hints, e.g. the members of a typing.Union
+    :return: the classes of the type hints, None if one of them cannot be
+        checked at runtime, e.g. typing.Any
+    """
+    types = []
+    for type_hint in type_hints:
+        if isinstance(type_hint, _GENERIC_PARENT) and \
+                type_hint.__origin__ is not None:
+            type_hint = type_hint.__origin__ if _PY37 else type_hint.__extra__
+        if not isinstance(type_hint, type):
+            return None
+        types.append(type_hint)
+    return tuple(types)
+
+
+def coercer_for(attribute_type):
+    """
+    Looks up how values can be coerced to the hinted type.
+
+    :param attribute_type: the type hint of the attribute
+    :return: a tuple of the hinted type, the types which can be coerced
+        (None if any type can be) and the constructor to coerce with, or
+        None if the type doesn't support coercion
+    """
+    if is_optional(attribute_type):
+        attribute_type = attribute_type.__args__[0]
+    if isinstance(attribute_type, type) and \
+            issubclass(attribute_type, enum.Enum):
+        return attribute_type, None, attribute_type
+    if attribute_type in _COERCERS:
+        source_types, constructor = _COERCERS[attribute_type]
+        return attribute_type, source_types, constructor
+    return None
+
+
+def camel_case(name: str) -> str:
+    """
+    Converts a snake_case field name to camelCase, to be used as the naming
+    of `DocumentConverter`.
+
+    :param name: the name of the field
+    :return: the camelCase key of the field
+    """
+    first, *rest = name.split('_')
+    return first + ''.join(part[:1].upper() + part[1:] for part in rest)
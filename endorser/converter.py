@@ -1,7 +1,12 @@
-from typing import get_type_hints, TypeVar, Type, Union, List
+import asyncio
+import inspect
+import time
+import weakref
+from typing import Iterable, List, Sequence, Type, TypeVar, Union
 
-from endorser.common import is_optional
-from endorser.schema import Schema
+from endorser.common import is_typing_list, is_union
+from endorser.error import construct_error, ErrorNames, ErrorSummary
+from endorser.schema import Schema, schema_type as _schema_type
 
 S = TypeVar('S', dict, list)
 T = TypeVar('T', bound=Schema)
@@ -10,8 +15,63 @@ T = TypeVar('T', bound=Schema)
 class ConversionError(Exception):
     """Exception to raise when conversion fails."""
 
-    def __init__(self, errors: list):
+    def __init__(self, errors: list, summary: ErrorSummary = None):
         self.errors = errors
+        self.summary = summary
+
+
+class BatchResult:
+    """
+    The result of converting a list document with
+    `DocumentConverter#convert_batch`.
+    """
+
+    def __init__(self, items: list, failures: list):
+        """
+        :param items: the successfully converted objects, in document order
+        :param failures: the index and the errors of every item which failed
+            the conversion
+        """
+        self.items = items
+        self.failures = failures
+
+    @property
+    def succeeded(self) -> int:
+        return len(self.items)
+
+    @property
+    def failed(self) -> int:
+        return len(self.failures)
+
+    @property
+    def total(self) -> int:
+        return self.succeeded + self.failed
+
+
+class _InvalidDocument(ValueError):
+    """Raised when a document doesn't match its Schema class."""
+
+    def __init__(self, error: dict):
+        super().__init__(error['error'])
+        self.error = error
+
+
+class SamplingStats:
+    """
+    Counts the validated and failed list items of a `DocumentConverter`
+    which validates only a sample of them.
+    """
+
+    def __init__(self):
+        self.sampled = 0
+        self.failed = 0
+
+    @property
+    def error_rate(self) -> float:
+        """
+        :return: the ratio of the failed items among the validated ones
+        """
+        return self.failed / self.sampled if self.sampled else 0.0
 
 
 class DocumentConverter:
@@ -19,6 +79,57 @@ class DocumentConverter:
     Converter class to convert documents to typed objects.
     """
 
+    def __init__(self, aggregate_errors=False, error_sample_size=10,
+                 max_depth=None, coerce=False, max_keys=None,
+                 max_list_length=None, max_nodes=None, time_budget=None,
+                 sample_rate=None, naming=None, fail_fast=False,
+                 adopt_documents=False):
+        """
+        :param aggregate_errors: whether to raise aggregated errors grouped by
+            class, field and error name instead of every single error
+        :param error_sample_size: the number of item indices to keep for
+            every group of aggregated errors
+        :param max_depth: the maximum nesting level of objects in the
+            document, unlimited if not set
+        :param coerce: whether to coerce values to the hinted types, e.g.
+            strings to int, UUID or datetime
+        :param max_keys: the maximum number of keys of an object, unlimited
+            if not set
+        :param max_list_length: the maximum length of a list, unlimited if
+            not set
+        :param max_nodes: the maximum number of objects and values in the
+            document, unlimited if not set
+        :param time_budget: the maximum number of seconds a conversion can
+            take, unlimited if not set
+        :param sample_rate: the fraction of the items of list documents and
+            rows to validate, evenly spread over the list. The other items are
+            built without validation. Every item is validated if not set
+        :param naming: a function which returns the key of a field in the
+            documents from its name, e.g. `endorser.common.camel_case`.
+            Aliases declared on the `Schema` class take precedence
+        :param fail_fast: whether to run the unknown attribute, type and
+            mandatory field checks of the objects before their validation
+            methods, skipping the validation methods of invalid objects
+        :param adopt_documents: whether the converted objects can use the
+            dicts of the document as their attribute storage instead of
+            copying them. The document must not be used after the conversion
+        """
+        self.aggregate_errors = aggregate_errors
+        self.error_sample_size = error_sample_size
+        self.max_depth = max_depth
+        self.coerce = coerce
+        self.max_keys = max_keys
+        self.max_list_length = max_list_length
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self.sample_rate = sample_rate
+        self.sampling_stats = SamplingStats()
+        self.naming = naming
+        self.fail_fast = fail_fast
+        self.adopt_documents = adopt_documents
+        self._key_tables = weakref.WeakKeyDictionary()
+        self._union_tables = weakref.WeakKeyDictionary()
+
     def convert(self, document: S, doc_type: Union[Type[T], Type[List[T]]],
                 allow_unknown=False) -> Union[T, List[T]]:
         """
@@ -29,72 +140,624 @@ class DocumentConverter:
         :param allow_unknown: whether to allow unknown values to be present
         :return: a populated class with type T
         """
+        summary = self._error_summary()
+        data, batches = self._transform(document, doc_type, allow_unknown,
+                                        summary=summary)
+        _run_batch_validators(batches)
+        return self._check_errors(data, summary)
+
+    async def convert_async(self, document: S,
+                            doc_type: Union[Type[T], Type[List[T]]],
+                            allow_unknown=False) -> Union[T, List[T]]:
+        """
+        Converts an S from type list/dict to Type[T]/Type[List[T]], awaiting
+        asynchronous batch validators concurrently.
+
+        :param document: the object to convert
+        :param doc_type: the class to convert to
+        :param allow_unknown: whether to allow unknown values to be present
+        :return: a populated class with type T
+        """
+        summary = self._error_summary()
+        data, batches = self._transform(document, doc_type, allow_unknown,
+                                        summary=summary)
+        pending = []
+        for instances, field, validator in _batch_validations(batches):
+            errors = validator([getattr(obj, field) for obj in instances])
+            if inspect.isawaitable(errors):
+                pending.append((instances, errors))
+            else:
+                _attach_batch_errors(instances, errors)
+        results = await asyncio.gather(*[errors for _, errors in pending])
+        for (instances, _), errors in zip(pending, results):
+            _attach_batch_errors(instances, errors)
+        return self._check_errors(data, summary)
+
+    def convert_batch(self, document: list, doc_type: Type[List[T]],
+                      allow_unknown=False) -> BatchResult:
+        """
+        Converts a list document, separating the items which failed the
+        conversion from the valid ones instead of raising a
+        `ConversionError`. Exceeding a limit of the converter still fails
+        the whole batch.
+
+        :param document: the list to convert
+        :param doc_type: the List type to convert to
+        :param allow_unknown: whether to allow unknown values to be present
+        :return: the converted items and the failures
+        """
+        if type(document) is not list:
+            raise TypeError('%s type cannot be converted in batch, it has to '
+                            'be a list' % str(type(document)))
         if not document:
-            raise ValueError('empty document provided')
+            return BatchResult([], [])
+        invalid = {}
+        data, batches = self._transform(document, doc_type, allow_unknown,
+                                        invalid)
+        _run_batch_validators(batches)
+        self._record_samples(data)
+
+        items = []
+        failures = []
+        for i, obj in enumerate(data):
+            if i in invalid:
+                failures.append((i, invalid[i]))
+            elif not isinstance(obj, Schema):
+                failures.append((i, [construct_error(
+                    str(i), "wrong type. expected: 'dict', provided: '%s'"
+                    % type(obj).__name__,
+                    name=ErrorNames.WRONG_TYPE.value)]))
+            elif obj.doc_errors:
+                failures.append((i, obj.doc_errors))
+            else:
+                items.append(obj)
+        return BatchResult(items, failures)
+
+    def convert_rows(self, rows: Iterable[Sequence], columns: Sequence[str],
+                     doc_type: Type[T], allow_unknown=False) -> List[T]:
+        """
+        Converts table shaped data to a list of T. Columns are mapped to the
+        fields of T once, then every row is set on the objects by position,
+        without building a dict for it.
+
+        :param rows: the rows to convert, e.g. a `csv.reader`
+        :param columns: the field name of every column
+        :param doc_type: the class to convert the rows to
+        :param allow_unknown: whether to allow unknown columns to be present
+        :return: a list of populated classes with type T
+        """
+        hints = _type_hints(doc_type)
+        key_table = self._key_table(doc_type)
+        if key_table:
+            columns = [key_table[0].get(column, column) for column in columns]
+        for column in columns:
+            if column not in hints and not allow_unknown:
+                raise ValueError('%s is not type hinted' % column)
+        if len(set(columns)) != len(columns):
+            raise ValueError('a field is provided by more than one column')
+
+        summary = self._error_summary()
+        data = []
+        validated = []
+        for i, row in enumerate(rows):
+            obj = doc_type.__new__(doc_type)
+            if self.sample_rate is None or _is_sampled(i, self.sample_rate):
+                obj._populate(zip(columns, row), allow_unknown, self.coerce,
+                              self.fail_fast)
+                if obj._instance_errors:
+                    _add_aliases(obj._instance_errors, key_table)
+                if summary is not None and obj._instance_errors:
+                    # the conversion fails anyway, only keep the summary
+                    summary.add(obj._instance_errors, i)
+                    obj = None
+                else:
+                    validated.append(obj)
+            else:
+                obj.__dict__.update(zip(columns, row))
+                if self.coerce:
+                    obj._coerce_attributes()
+            data.append(obj)
+        if doc_type._batch_validators and validated:
+            _run_batch_validators({doc_type: validated})
+        return self._check_errors(data, summary)
 
-        if type(document) is dict:
-            data = _transform_dict(document, doc_type, allow_unknown)
-            if data.doc_errors:
-                raise ConversionError(data.doc_errors)
-        elif type(document) is list:
-            data = _transform_list(document, doc_type, allow_unknown)
+    def convert_cursor(self, cursor, doc_type: Type[T], allow_unknown=False,
+                       batch_size=1000) -> List[T]:
+        """
+        Converts the result of a DB-API cursor to a list of T, mapping the
+        columns by `cursor.description`.
+
+        :param cursor: the cursor to fetch the rows from
+        :param doc_type: the class to convert the rows to
+        :param allow_unknown: whether to allow unknown columns to be present
+        :param batch_size: the number of rows to fetch at once
+        :return: a list of populated classes with type T
+        """
+        columns = [column[0] for column in cursor.description]
+        return self.convert_rows(_fetch_rows(cursor, batch_size), columns,
+                                 doc_type, allow_unknown)
+
+    def convert_csv(self, reader: Iterable[Sequence[str]], doc_type: Type[T],
+                    allow_unknown=False) -> List[T]:
+        """
+        Converts the rows of a `csv.reader` to a list of T, mapping the
+        columns by the header row.
+
+        :param reader: the reader to read the rows from
+        :param doc_type: the class to convert the rows to
+        :param allow_unknown: whether to allow unknown columns to be present
+        :return: a list of populated classes with type T
+        """
+        reader = iter(reader)
+        columns = next(reader, None)
+        if columns is None:
+            return []
+        return self.convert_rows(reader, columns, doc_type, allow_unknown)
+
+    def _error_summary(self):
+        """
+        :return: the summary to fold the errors into while converting, None if
+            errors aren't aggregated
+        """
+        if self.aggregate_errors:
+            return ErrorSummary(self.error_sample_size)
+        return None
+
+    def _check_errors(self, data, summary: ErrorSummary = None):
+        """
+        Collects the validation errors of the converted objects.
+
+        :param data: the converted object or list of objects
+        :param summary: the summary of the errors already folded during the
+            conversion if errors are aggregated
+        :raises ConversionError: if validation failed on any object
+        :return: the converted data
+        """
+        self._record_samples(data)
+        if summary is not None:
+            return self._check_errors_aggregated(data, summary)
+
+        if type(data) is list:
             errors = []
             for obj in data:
                 if obj.doc_errors:
                     errors = errors + obj.doc_errors
             if errors:
                 raise ConversionError(errors)
+        elif data.doc_errors:
+            raise ConversionError(data.doc_errors)
+        return data
+
+    def _record_samples(self, data):
+        """
+        Counts the validated and failed items of a list document if only a
+        sample of the items is validated.
+        """
+        if self.sample_rate is not None and type(data) is list:
+            self.sampling_stats.sampled += int(len(data) * self.sample_rate)
+            self.sampling_stats.failed += sum(
+                1 for obj in data
+                if not isinstance(obj, Schema) or obj.doc_errors)
+
+    @staticmethod
+    def _check_errors_aggregated(data, summary: ErrorSummary):
+        """
+        Folds the remaining validation errors, e.g. the ones of batch
+        validators, into the summary. Items which already failed during the
+        conversion have been released and are None.
+        """
+        if type(data) is list:
+            for i, obj in enumerate(data):
+                if obj is not None and obj.doc_errors:
+                    summary.add(obj.doc_errors, i)
+        else:
+            summary.add(data.doc_errors)
+        if summary:
+            raise ConversionError(summary.errors, summary)
+        return data
+
+    def _transform(self, document: S, doc_type, allow_unknown: bool,
+                   failures: dict = None, summary: ErrorSummary = None):
+        """
+        Transforms the document to type T or List[T].
+
+        The document is walked with an explicit stack instead of recursion:
+        every nested object to convert is collected first, then the objects
+        are instantiated in reverse order, so nested objects always exist
+        before the object containing them.
+
+        :param document: the data to transform
+        :param doc_type: the class to transform to
+        :param allow_unknown: whether to allow unknown values to be present
+        :param failures: if provided, items of a list document which don't
+            match their Schema class are left unconverted and their errors
+            are collected into it by index, instead of raising a `ValueError`
+        :param summary: if provided, the errors of the items of a list
+            document are folded into it as soon as an item is instantiated,
+            and the failed items are released and left as None
+        :return: the transformed object and the instances of every class
+            with batch validators, in document order
+        """
+        if not document:
+            raise ValueError('empty document provided')
+
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.monotonic() + self.time_budget
+
+        root = [document]
+        pending = []
+        nodes = 0
+        if type(document) is list:
+            self._check_list_length(document, 'document', doc_type)
+            nodes = len(document)
+            self._check_nodes(nodes, 'document', doc_type)
+            self._push_list(pending, root, 0, _list_content_type(doc_type),
+                            1, True, self.sample_rate)
+        elif type(document) is dict:
+            pending.append((root, 0, doc_type, 1, True))
         else:
             raise TypeError('%s type cannot be converted, it has to be either'
                             'a list or a dict' % str(type(document)))
-        return data
 
+        objects = []
+        item = None
+        while pending:
+            container, key, schema, depth, validate = pending.pop()
+            if failures is not None and container is root[0]:
+                # everything queued from here on belongs to this item
+                item = key, len(objects), len(pending)
+            doc = container[key]
+            if self.max_depth is not None and depth > self.max_depth:
+                raise _budget_exceeded(
+                    key, schema, 'maximum depth %d exceeded' % self.max_depth,
+                    ErrorNames.MAX_DEPTH_EXCEEDED)
+            if self.max_keys is not None and len(doc) > self.max_keys:
+                raise _budget_exceeded(
+                    key, schema, 'maximum number of keys %d exceeded'
+                    % self.max_keys, ErrorNames.MAX_KEYS_EXCEEDED)
+            if self.max_nodes is not None:
+                # count the list elements before the lists are copied
+                nodes += len(doc) + 1 + sum(len(v) for v in doc.values()
+                                            if type(v) is list)
+                self._check_nodes(nodes, key, schema)
+            if deadline is not None and time.monotonic() > deadline:
+                raise _time_budget_exceeded(key, schema, self.time_budget)
 
-def _transform_dict(document: dict, doc_type: Type[T],
-                    allow_unknown: bool) -> T:
+            try:
+                self._visit(pending, objects, container, key, schema, depth,
+                            validate, allow_unknown)
+            except _InvalidDocument as e:
+                if item is None:
+                    raise ValueError(e.error['error']) from None
+                index, objects_count, pending_count = item
+                del objects[objects_count:]
+                del pending[pending_count:]
+                failures[index] = [e.error]
+
+        batches = {}
+        # the number of instances in every batch before the current item
+        marks = {}
+        for container, key, schema, validate in reversed(objects):
+            if deadline is not None and time.monotonic() > deadline:
+                raise _time_budget_exceeded(key, schema, self.time_budget)
+            doc = container[key]
+            key_table = self._key_table(schema)
+            if not validate:
+                if key_table:
+                    doc = dict(_translate_keys(doc, key_table))
+                obj = container[key] = schema.construct(**doc)
+                if self.coerce:
+                    obj._coerce_attributes()
+                continue
+            if self.adopt_documents:
+                if key_table:
+                    _rename_keys(doc, key_table)
+                obj = schema._adopt(doc, allow_unknown, self.coerce,
+                                    self.fail_fast)
+            elif key_table:
+                obj = schema.__new__(schema)
+                obj._populate(_translate_keys(doc, key_table), allow_unknown,
+                              self.coerce, self.fail_fast)
+            else:
+                obj = schema(_allow_unknown=allow_unknown,
+                             _coerce=self.coerce, _fail_fast=self.fail_fast,
+                             **doc)
+            container[key] = obj
+            if obj._instance_errors:
+                _add_aliases(obj._instance_errors, key_table)
+            if schema._batch_validators:
+                batches.setdefault(schema, []).append(obj)
+            if summary is not None and container is root[0]:
+                # nested objects are instantiated right before their item, so
+                # the errors of the item are complete here
+                if obj.doc_errors:
+                    summary.add(obj.doc_errors, key)
+                    container[key] = None
+                    for instances_schema, instances in batches.items():
+                        del instances[marks.get(instances_schema, 0):]
+                marks = {instances_schema: len(instances)
+                         for instances_schema, instances in batches.items()}
+        for instances in batches.values():
+            instances.reverse()
+        return root[0], batches
+
+    def _visit(self, pending: list, objects: list, container, key, type_hint,
+               depth: int, validate: bool, allow_unknown: bool):
+        """
+        Registers the document under `container[key]` for conversion and
+        queues its nested documents.
+        """
+        doc = container[key]
+        schema = type_hint
+        if not isinstance(type_hint, type):
+            schema = self._resolve_schema(type_hint, doc) or type_hint
+
+        # the keys are translated when the object is built, nested documents
+        # are replaced under their original keys
+        key_table = self._key_table(schema)
+        names, keys = key_table or ({}, {})
+        hints = _type_hints(schema)
+        for k, v in doc.items():
+            name = names.get(k, k)
+            if name not in hints:
+                if allow_unknown:
+                    continue
+                raise _InvalidDocument(construct_error(
+                    k, '%s is not type hinted' % k, schema.__name__,
+                    name=ErrorNames.UNKNOWN_ATTRIBUTE.value))
+            if k in keys and keys[k] in doc:
+                raise _InvalidDocument(construct_error(
+                    k, '%s is provided both as %s and %s'
+                    % (k, k, keys[k]), schema.__name__,
+                    name=ErrorNames.DUPLICATE_ATTRIBUTE.value))
+
+            if type(v) is dict:
+                if _schema_type(hints[name]) or self._union_table(hints[name]):
+                    pending.append((doc, k, hints[name], depth + 1, validate))
+            elif type(v) is list:
+                self._check_list_length(v, k, schema)
+                if is_typing_list(hints[name]):
+                    self._push_list(pending, doc, k, hints[name].__args__[0],
+                                    depth + 1, validate)
+        objects.append((container, key, schema, validate))
+
+    def _push_list(self, pending: list, container, key, type_hint,
+                   depth: int, validate: bool, sample_rate: float = None):
+        """
+        Replaces the list under `container[key]` with a copy and queues its
+        dict elements for conversion to the Schema class hinted by
+        `type_hint`. Lists of anything other than Schema objects are left as
+        they are.
+        """
+        if not self._union_table(type_hint):
+            type_hint = _schema_type(type_hint)
+            if not type_hint:
+                return
+        items = list(container[key])
+        container[key] = items
+        for i in reversed(range(len(items))):
+            if type(items[i]) is dict:
+                pending.append((items, i, type_hint, depth, validate and (
+                    sample_rate is None or _is_sampled(i, sample_rate))))
+
+    def _resolve_schema(self, type_hint, document: dict):
+        """
+        :param type_hint: the type hint of the document
+        :param document: the document to convert
+        :return: the Schema class to convert the document to, None if the
+            type hint isn't a Schema class or a union of them
+        """
+        union_table = self._union_table(type_hint)
+        if not union_table:
+            return _schema_type(type_hint)
+        key, schemas = union_table
+        try:
+            return schemas[document[key]]
+        except (KeyError, TypeError):
+            raise _InvalidDocument(construct_error(
+                key, '%s is not a known %s of %s'
+                % (document.get(key), key, type_hint),
+                name=ErrorNames.UNKNOWN_DISCRIMINATOR.value))
+
+    def _union_table(self, union):
+        """
+        Compiles the lookup table of a union of Schema classes once.
+
+        :param union: the type hint
+        :return: the discriminator key and the Schema class of every
+            discriminator value, None if the type hint isn't a union of
+            Schema classes
+        """
+        if not is_union(union):
+            return None
+        try:
+            return self._union_tables[union]
+        except KeyError:
+            pass
+        members = [member for member in union.__args__
+                   if member is not type(None)]
+        if not all(map(_schema_type, members)):
+            # documents of other unions are validated as plain values
+            self._union_tables[union] = None
+            return None
+        key = None
+        schemas = {}
+        for member in members:
+            discriminator = getattr(member, '_discriminator', None)
+            if not discriminator:
+                raise TypeError('%s has no discriminator, it cannot be used '
+                                'in a union' % member)
+            if key is not None and discriminator[0] != key:
+                raise TypeError('the members of %s have different '
+                                'discriminator keys' % union)
+            key = discriminator[0]
+            schemas[discriminator[1]] = member
+        self._union_tables[union] = key, schemas
+        return key, schemas
+
+    def _key_table(self, schema):
+        """
+        Compiles the translation of document keys to field names once per
+        class.
+
+        :param schema: the Schema class
+        :return: the field name of every key and the key of every field name,
+            None if the keys are the field names
+        """
+        try:
+            return self._key_tables[schema]
+        except KeyError:
+            pass
+        aliases = getattr(schema, '_aliases', {})
+        fields = {}
+        for name in _type_hints(schema):
+            if name in aliases:
+                fields[name] = aliases[name]
+            elif self.naming:
+                fields[name] = self.naming(name)
+        fields = {name: k for name, k in fields.items() if k != name}
+        key_table = None
+        if fields:
+            key_table = ({k: name for name, k in fields.items()}, fields)
+        self._key_tables[schema] = key_table
+        return key_table
+
+    def _check_list_length(self, value: list, key, schema):
+        """
+        :raises ConversionError: if the list is longer than allowed
+        """
+        if self.max_list_length is not None and \
+                len(value) > self.max_list_length:
+            raise _budget_exceeded(
+                key, schema, 'maximum list length %d exceeded'
+                % self.max_list_length, ErrorNames.MAX_LIST_LENGTH_EXCEEDED)
+
+    def _check_nodes(self, nodes: int, key, schema):
+        """
+        :raises ConversionError: if the document has more nodes than allowed
+        """
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            raise _budget_exceeded(
+                key, schema, 'maximum number of nodes %d exceeded'
+                % self.max_nodes, ErrorNames.MAX_NODES_EXCEEDED)
+
+
+def _translate_keys(document: dict, key_table):
     """
-    Transforms the document from dict to type T.
+    :return: the items of the document with the keys translated to field names
+    """
+    names = key_table[0]
+    return ((names.get(k, k), v) for k, v in document.items())
+
 
-    :param document: the data to transform
-    :param doc_type: the class to transform to
-    :return: the transformed object
+def _rename_keys(document: dict, key_table):
     """
-    if is_optional(doc_type):
-        hints = get_type_hints(doc_type.__args__[0])
-        doc_type = doc_type.__args__[0]
-    else:
-        hints = get_type_hints(doc_type)
-    for k, v in document.items():
-        if k not in hints:
-            raise ValueError('%s is not type hinted' % k)
+    Translates the keys of the document to field names in place.
+    """
+    for name, k in key_table[1].items():
+        if k in document:
+            document[name] = document.pop(k)
 
-        if type(v) is dict:
-            document[k] = _transform_dict(v, hints[k], allow_unknown)
-        elif type(v) is list:
-            try:
-                document[k] = _transform_list(
-                    v, hints[k], allow_unknown)
-            except (IndexError, TypeError, AttributeError):
-                # if we get either of these exceptions it means that the
-                # annotation is a generic list with no type hints for it's
-                # content, so we'll leave the content as it is.
-                pass
-    return doc_type(_allow_unknown=allow_unknown, **document)
+
+def _add_aliases(errors: list, key_table):
+    """
+    Adds the key a field was provided with to its errors.
+    """
+    if key_table:
+        for error in errors:
+            if error.get('field') in key_table[1]:
+                error['alias'] = key_table[1][error['field']]
+
+
+def _budget_exceeded(key, schema, msg: str, name: ErrorNames):
+    """
+    :return: the error to raise when the document exceeds a limit
+    """
+    return ConversionError([construct_error(
+        str(key), msg, getattr(schema, '__name__', str(schema)),
+        name=name.value)])
+
+
+def _time_budget_exceeded(key, schema, time_budget):
+    return _budget_exceeded(key, schema, 'time budget of %s seconds exceeded'
+                            % time_budget, ErrorNames.TIME_BUDGET_EXCEEDED)
+
+
+def _fetch_rows(cursor, batch_size: int):
+    """
+    :return: the rows of the cursor, fetched in batches
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _batch_validations(batches: dict):
+    """
+    :param batches: the instances of every class with batch validators
+    :return: the instances, the field name and the batch validator for every
+        batch validator to run
+    """
+    for schema, instances in batches.items():
+        for field, validator in schema._batch_validators:
+            yield instances, field, validator
+
+
+def _run_batch_validators(batches: dict):
+    """
+    Runs the batch validators on the instances of every class.
+
+    :param batches: the instances of every class with batch validators
+    """
+    for instances, field, validator in _batch_validations(batches):
+        errors = validator([getattr(obj, field) for obj in instances])
+        if inspect.isawaitable(errors):
+            errors.close()
+            raise TypeError('%s is asynchronous, use convert_async '
+                            'instead' % validator.__qualname__)
+        _attach_batch_errors(instances, errors)
+
+
+def _attach_batch_errors(instances: list, errors: dict):
+    """
+    Adds the errors returned by a batch validator to the instances they
+    belong to.
+
+    :param instances: the validated instances
+    :param errors: the errors mapped to the index of the invalid value
+    """
+    for i, error in (errors or {}).items():
+        instances[i].instance_errors.append(error)
 
 
-def _transform_list(document: list, doc_type: Type[T],
-                    allow_unknown: bool) -> List[T]:
+def _is_sampled(index: int, sample_rate: float) -> bool:
+    """
+    :return: whether the item with the index has to be validated, picking
+        every 1/sample_rate-th item
     """
-    Transforms the document from list to type T.
+    return int((index + 1) * sample_rate) > int(index * sample_rate)
 
-    :param document: the data to transform
-    :param doc_type: the class to transform to
-    :return: the transformed object
+
+def _type_hints(schema) -> dict:
+    """
+    :param schema: the Schema class
+    :return: the type hints of the class, resolved only once per class
+    """
+    if '_processed' not in schema.__dict__:
+        schema._process()
+    return schema._type_hints
+
+
+def _list_content_type(doc_type):
+    """
+    :param doc_type: the `typing.List` type hint
+    :return: the type of the content of the list
     """
     try:
-        type_ = doc_type.__args__[0]
-    except TypeError:
+        return doc_type.__args__[0]
+    except (TypeError, AttributeError):
         raise TypeError('generic List type cannot be used as document type, '
                         'provide a type for the content of the list as well')
-    return [_transform_dict(obj, type_, allow_unknown) for obj in
-            document]
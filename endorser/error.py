@@ -1,3 +1,4 @@
+import bisect
 import warnings
 from enum import Enum
 
@@ -43,4 +44,61 @@ class ErrorNames(Enum):
     MANDATORY_FIELD_NOT_SET = "MANDATORY_FIELD_NOT_SET"
     WRONG_TYPE = "WRONG_TYPE"
     UNKNOWN_ATTRIBUTE = "UNKNOWN_ATTRIBUTE"
+    DUPLICATE_ATTRIBUTE = "DUPLICATE_ATTRIBUTE"
+    UNKNOWN_DISCRIMINATOR = "UNKNOWN_DISCRIMINATOR"
+    MAX_DEPTH_EXCEEDED = "MAX_DEPTH_EXCEEDED"
+    MAX_KEYS_EXCEEDED = "MAX_KEYS_EXCEEDED"
+    MAX_LIST_LENGTH_EXCEEDED = "MAX_LIST_LENGTH_EXCEEDED"
+    MAX_NODES_EXCEEDED = "MAX_NODES_EXCEEDED"
+    TIME_BUDGET_EXCEEDED = "TIME_BUDGET_EXCEEDED"
 
+
+class ErrorSummary:
+    """
+    Aggregates errors by class, field and error name. Only the smallest item
+    indices are kept for every group, so memory usage doesn't depend on the
+    number of errors or on the order the items are added in.
+    """
+
+    def __init__(self, sample_size: int = 10):
+        """
+        :param sample_size: the maximum number of item indices to keep for
+            every group of errors
+        """
+        self.sample_size = sample_size
+        self.total = 0
+        self._groups = {}
+
+    def add(self, errors: list, index: int = None):
+        """
+        Adds the errors of a converted item to the summary.
+
+        :param errors: the validation errors of the item
+        :param index: the index of the item in the document, optional
+        """
+        for error in errors:
+            key = (error.get('class'), error['field'], error.get('name'))
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {
+                    'field': error['field'], 'error': error['error'],
+                    'class': error.get('class'), 'name': error.get('name'),
+                    'count': 0, 'indices': []}
+            group['count'] += 1
+            indices = group['indices']
+            if index is not None and index not in indices:
+                bisect.insort(indices, index)
+                if len(indices) > self.sample_size:
+                    indices.pop()
+            self.total += 1
+
+    @property
+    def errors(self) -> list:
+        """
+        :return: an error dict for every group with the number of occurrences
+            and the sampled indices
+        """
+        return list(self._groups.values())
+
+    def __bool__(self):
+        return self.total > 0
@@ -0,0 +1,84 @@
+import collections
+import threading
+from typing import Type
+
+from endorser.schema import Schema
+
+
+class SchemaFactory:
+    """
+    Builds `Schema` classes at runtime from field specifications. Classes
+    with the same definition are shared, and only the most recently used
+    `maxsize` classes are kept.
+
+    The state compiled for a class is stored on the class itself, and
+    converters only keep weak references to the classes, so it's released
+    together with an evicted class.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        """
+        :param maxsize: the maximum number of classes to keep
+        """
+        self.maxsize = maxsize
+        self._classes = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, name: str, fields: dict) -> Type[Schema]:
+        """
+        Returns the `Schema` class with the given name and fields, building it
+        only if the same definition isn't cached already.
+
+        :param name: the name of the class
+        :param fields: the type hint of every field, or a tuple of the type
+            hint and the default value for optional fields
+        :return: the Schema class
+        """
+        key = name, tuple((field, _freeze(spec))
+                          for field, spec in fields.items())
+        with self._lock:
+            cls = self._classes.get(key)
+            if cls is not None:
+                self._classes.move_to_end(key)
+                return cls
+
+            cls = _build(name, fields)
+            cls._process()
+            self._classes[key] = cls
+            if len(self._classes) > self.maxsize:
+                self._classes.popitem(last=False)
+            return cls
+
+    def clear(self):
+        """
+        Drops every cached class.
+        """
+        with self._lock:
+            self._classes.clear()
+
+    def __len__(self):
+        return len(self._classes)
+
+
+def _build(name: str, fields: dict) -> Type[Schema]:
+    """
+    :return: a new Schema class with the given name and fields
+    """
+    namespace = {'__annotations__': {}, '__module__': __name__}
+    for field, spec in fields.items():
+        if type(spec) is tuple:
+            namespace['__annotations__'][field], namespace[field] = spec
+        else:
+            namespace['__annotations__'][field] = spec
+    return type(name, (Schema,), namespace)
+
+
+def _freeze(spec):
+    """
+    :return: the hashable form of a field specification
+    """
+    try:
+        hash(spec)
+        return spec
+    except TypeError:
+        return repr(spec)
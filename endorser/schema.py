@@ -1,50 +1,81 @@
-from endorser.common import is_optional, is_typing_list
+import array
+
+from endorser.common import ARRAY_TYPECODES, coercer_for, is_optional, \
+    is_typing_list, is_union, resolve_type_hints, runtime_types
 from endorser.error import construct_error, ErrorNames
 
 
 class Schema:
+    # the error containers aren't attributes of the document, so they are
+    # kept out of the instance dict
+    __slots__ = ('__dict__', '__weakref__', '_instance_errors', '_doc_errors')
 
     def __new__(cls, *args, **kwargs):
-        """
-        Collects mandatory fields into a list and binds it to the class.
-        Only has to run once for every class, hence the `_processed` property.
-        """
         if args:
             raise AttributeError("you can only use keyword arguments to "
                                  "instantiate a Schema object")
 
-        if not hasattr(cls, '_processed'):
-            optional_fields = []
-            property_names = list(cls.__annotations__.keys())
-            for property_name in property_names:
-                annotated_type = cls.__annotations__[property_name]
-
-                # collect optional fields
-                if is_optional(annotated_type):
-                    desired_type = annotated_type.__args__[0]
-                    optional_fields.append(property_name)
-
-                    # validate default value type
-                    if hasattr(cls, property_name):
-                        attr_value = getattr(cls, property_name)
-                        cls._validate_type_hint(desired_type, attr_value)
-                elif hasattr(cls, property_name):
-                    raise AttributeError(
-                        f"{property_name} has a default value and it's "
-                        f"not an Optional.")
-
-                # assign empty/None class variables from annotations
-                # necessary to check for unknown attributes later on
-                if not hasattr(cls, property_name):
-                    setattr(cls, property_name, None)
-
-            cls._mandatory_fields = [p for p in property_names
-                                     if p not in optional_fields
-                                     or property_names.remove(p)]
-            cls._processed = True
+        if '_processed' not in cls.__dict__:
+            cls._process()
 
         return super(Schema, cls).__new__(cls)
 
+    @classmethod
+    def _process(cls):
+        """
+        Resolves the type hints and collects mandatory fields into a list and
+        binds them to the class.
+        Only has to run once for every class, hence the `_processed` property.
+        """
+        cls._type_hints = resolve_type_hints(cls)
+        cls._coercers = {}
+        cls._batch_validators = [
+            (attr.__func__._batch_validated_field, getattr(cls, name))
+            for name, attr in cls.__dict__.items()
+            if isinstance(attr, classmethod)
+            and hasattr(attr.__func__, '_batch_validated_field')]
+        optional_fields = []
+        property_names = list(cls.__annotations__.keys())
+        for property_name in property_names:
+            annotated_type = cls._type_hints[property_name]
+
+            coercer = coercer_for(annotated_type)
+            if coercer:
+                cls._coercers[property_name] = coercer
+
+            # collect optional fields
+            if is_optional(annotated_type):
+                desired_type = annotated_type.__args__[0]
+                optional_fields.append(property_name)
+
+                # validate default value type
+                if hasattr(cls, property_name):
+                    attr_value = getattr(cls, property_name)
+                    cls._validate_type_hint(desired_type, attr_value)
+            elif hasattr(cls, property_name):
+                raise AttributeError(
+                    f"{property_name} has a default value and it's "
+                    f"not an Optional.")
+
+            # assign empty/None class variables from annotations
+            # necessary to check for unknown attributes later on
+            if not hasattr(cls, property_name):
+                setattr(cls, property_name, None)
+
+        cls._mandatory_fields = [p for p in property_names
+                                 if p not in optional_fields
+                                 or property_names.remove(p)]
+
+        cls._defaults = {p: getattr(cls, p) for p in optional_fields}
+
+        # validation methods of the mandatory fields, cheapest first
+        validators = [(p, cls.__dict__['validate_%s' % p])
+                      for p in cls._mandatory_fields
+                      if 'validate_%s' % p in cls.__dict__]
+        cls._validators = sorted(
+            validators, key=lambda v: getattr(v[1], '_validation_cost', 0))
+        cls._processed = True
+
     @classmethod
     def _validate_type_hint(cls, desired_type, attr_value):
         if not isinstance(attr_value, (desired_type, type(None))):
@@ -53,38 +84,206 @@ class Schema:
                 f"'{desired_type.__name__}' but got "
                 f"'{type(attr_value).__name__}'")
 
-    def __init__(self, _allow_unknown=False, **kwargs):
+    def __init__(self, _allow_unknown=False, _coerce=False, _fail_fast=False,
+                 **kwargs):
         """
         Initializes the `Schema` object, running provided validations.
 
         :param _allow_unknown: whether to allow unknown properties on the
             object
+        :param _coerce: whether to coerce values to the hinted type, e.g.
+            strings to int, UUID or datetime
+        :param _fail_fast: whether to run the unknown attribute, type and
+            mandatory field checks before the validation methods, and skip
+            the validation methods once the object has an error
+        """
+        self._populate(kwargs.items(), _allow_unknown, _coerce, _fail_fast)
+
+    @classmethod
+    def construct(cls, **kwargs):
+        """
+        Instantiates the object from trusted, already validated data. The
+        values are set as they are, without running any validation, only
+        nested `Schema` objects provided as dicts are constructed as well.
+        Members of discriminated unions are picked by their discriminator.
+        """
+        obj = cls.__new__(cls)
+        hints = cls._type_hints
+        for k, v in kwargs.items():
+            if type(v) is dict:
+                kwargs[k] = _construct_nested(hints.get(k), v)
+            elif type(v) is list and is_typing_list(hints.get(k)):
+                element_type = hints[k].__args__[0]
+                if is_union(element_type) or schema_type(element_type):
+                    kwargs[k] = [_construct_nested(element_type, item)
+                                 for item in v]
+        obj.__dict__.update(kwargs)
+        return obj
+
+    @classmethod
+    def _adopt(cls, document: dict, allow_unknown, coerce, fail_fast=False):
+        """
+        Instantiates the object using the document itself as the attribute
+        storage of the object, instead of copying every value. Missing
+        optional fields are filled in with their default values.
+
+        Only the values replaced by coercion or validation methods are
+        written back.
+
+        :param document: the attributes of the object, owned by the object
+            from now on
+        :param allow_unknown: whether to allow unknown properties on the
+            object
+        :param coerce: whether to coerce values to the hinted type
+        :param fail_fast: whether to run the structural checks first
         """
+        obj = cls.__new__(cls)
+        obj.__dict__ = document
+        # validation methods may add attributes to the document
+        obj._populate(list(document.items()), allow_unknown, coerce,
+                      fail_fast, adopted=True)
+        for k, v in cls._defaults.items():
+            if k not in document:
+                document[k] = v
+        return obj
+
+    def __reduce__(self):
+        return _restore, (self.__class__, vars(self).copy())
+
+    def _populate(self, items, allow_unknown, coerce, fail_fast=False,
+                  adopted=False):
+        """
+        Validates and sets the attributes of the object.
+
+        :param items: the name and value pairs of the attributes
+        :param allow_unknown: whether to allow unknown properties on the
+            object
+        :param coerce: whether to coerce values to the hinted type
+        :param fail_fast: whether to run the structural checks first
+        :param adopted: whether the items are the instance dict itself, so
+            only replaced values have to be set
+        """
+        if fail_fast:
+            return self._populate_fail_fast(items, allow_unknown, coerce,
+                                            adopted)
 
         mandatory_fields = self._mandatory_fields.copy()
         self._instance_errors = []
-        self._doc_errors = []
 
         class_items = self.__class__.__dict__
+        coercers = self._coercers if coerce else {}
         # set attributes
-        for k, v in kwargs.items():
+        for k, v in items:
+            provided = v
             # remove provided attributes from the mandatory list
             # this is necessary to accept provided `None` values as well
-            if k in mandatory_fields:
+            mandatory = k in mandatory_fields
+            if mandatory:
                 mandatory_fields.remove(k)
 
+            if k in coercers and v is not None:
+                v, coerced = self._coerce(k, v, coercers[k])
+                # skip the validations if the value is already invalid
+                mandatory = mandatory and coerced
+
+            if mandatory:
                 # run validations
                 validation_field = 'validate_%s' % k
                 if validation_field in class_items:
                     v = class_items[validation_field](self, v)
 
-                self._validate_type(k, v, allow_unknown=_allow_unknown)
+                self._validate_type(k, v, allow_unknown=allow_unknown)
 
-            setattr(self, k, v)
+            if not adopted or v is not provided:
+                setattr(self, k, v)
 
         # check if all mandatory fields have been set
         self._check_mandatory_fields(mandatory_fields)
 
+    def _populate_fail_fast(self, items, allow_unknown, coerce,
+                            adopted=False):
+        """
+        Sets the attributes of the object, running the cheap structural checks
+        (unknown attributes, coercion, types and mandatory fields) first.
+        The validation methods only run if those passed, ordered by their
+        cost, until one of them fails.
+        """
+        mandatory_fields = self._mandatory_fields.copy()
+        self._instance_errors = []
+
+        hints = self._type_hints
+        coercers = self._coercers if coerce else {}
+        for k, v in items:
+            if k not in hints:
+                if not allow_unknown:
+                    self._instance_errors.append(
+                        construct_error(k, "unknown attribute",
+                                        self.__class__.__name__,
+                                        name=ErrorNames.UNKNOWN_ATTRIBUTE
+                                        .value))
+                if not adopted:
+                    setattr(self, k, v)
+                continue
+
+            mandatory = k in mandatory_fields
+            if mandatory:
+                mandatory_fields.remove(k)
+
+            provided = v
+            if k in coercers and v is not None:
+                v, coerced = self._coerce(k, v, coercers[k])
+                mandatory = mandatory and coerced
+
+            if mandatory:
+                self._validate_type(k, v, allow_unknown=allow_unknown)
+
+            if not adopted or v is not provided:
+                setattr(self, k, v)
+
+        self._check_mandatory_fields(mandatory_fields)
+
+        for field, validator in self._validators:
+            if self._instance_errors:
+                return
+            value = getattr(self, field)
+            validated = validator(self, value)
+            if validated is not value:
+                setattr(self, field, validated)
+
+    def _coerce(self, attr_name, attr_val, coercer):
+        """
+        Coerces the value to the hinted type if it's one of the types which
+        can be coerced.
+
+        :param attr_name: the name of the attribute
+        :param attr_val: the value of the attribute
+        :param coercer: the hinted type, the types which can be coerced and
+            the constructor to coerce with
+        :return: the coerced value and whether the coercion succeeded
+        """
+        try:
+            return _coerce_value(attr_val, coercer), True
+        except (ValueError, TypeError, ArithmeticError):
+            self._instance_errors.append(construct_error(
+                attr_name, "wrong type. cannot coerce '%s' to '%s'"
+                % (type(attr_val).__name__, coercer[0].__name__),
+                self.__class__.__name__, name=ErrorNames.WRONG_TYPE.value))
+            return attr_val, False
+
+    def _coerce_attributes(self):
+        """
+        Coerces the attributes of an object built without validation. Values
+        which cannot be coerced are left as they are.
+        """
+        attributes = self.__dict__
+        for k, coercer in self._coercers.items():
+            attr_val = attributes.get(k)
+            if attr_val is not None:
+                try:
+                    attributes[k] = _coerce_value(attr_val, coercer)
+                except (ValueError, TypeError, ArithmeticError):
+                    pass
+
     def _validate_type(self, attr_name, attr_val, allow_unknown):
         """
         Validates the type of the property based on the annotation.
@@ -95,7 +294,7 @@ class Schema:
         """
         type_ = type(attr_val)
         try:
-            annotated_type = self.__class__.__annotations__[attr_name]
+            annotated_type = self._type_hints[attr_name]
         except KeyError:
             # KeyError means unknown attribute. Can only occur when
             # `_allow_unknown is True`
@@ -109,6 +308,15 @@ class Schema:
             self._validate_typing_list(attr_name, attr_val)
         elif is_optional(annotated_type):
             self._validate_optional_type(attr_name, attr_val)
+        elif is_union(annotated_type):
+            types = runtime_types(annotated_type.__args__)
+            if types is not None and not isinstance(attr_val, types):
+                self._instance_errors.append(
+                    construct_error(attr_name,
+                                    "wrong type. expected: '%s', provided: "
+                                    "'%s'" % (annotated_type, type_.__name__),
+                                    self.__class__.__name__,
+                                    name=ErrorNames.WRONG_TYPE.value))
         elif not type_ == annotated_type:
             self._instance_errors.append(
                 construct_error(attr_name,
@@ -118,11 +326,21 @@ class Schema:
                                 name=ErrorNames.WRONG_TYPE.value))
 
     def _validate_typing_list(self, attr_name, attr_val):
-        annotated_type = self.__class__.__annotations__[attr_name]
+        annotated_type = self._type_hints[attr_name]
         list_element_type = annotated_type.__args__[0]
 
+        # compact arrays can only hold values of the expected type
+        if type(attr_val) is array.array and \
+                attr_val.typecode == ARRAY_TYPECODES.get(list_element_type):
+            return
+
+        element_types = runtime_types(
+            list_element_type.__args__ if is_union(list_element_type) or
+            is_optional(list_element_type) else (list_element_type,))
+        if element_types is None:
+            return
         for i, elem in enumerate(attr_val):
-            if not isinstance(elem, list_element_type):
+            if not isinstance(elem, element_types):
                 self._instance_errors.append(
                     construct_error(
                         attr_name, "wrong type in index %s. expected: "
@@ -134,7 +352,7 @@ class Schema:
                 break
 
     def _validate_optional_type(self, attr_name, attr_val):
-        annotated_type = self.__class__.__annotations__[attr_name]
+        annotated_type = self._type_hints[attr_name]
         desired_type = annotated_type.__args__[0]
 
         if not isinstance(attr_val, desired_type):
@@ -158,9 +376,14 @@ class Schema:
     @property
     def instance_errors(self):
         """
-        :return: the validation errors on this object
+        :return: the validation errors on this object, created on first use
+            for objects built without validation
         """
-        return self._instance_errors
+        try:
+            return self._instance_errors
+        except AttributeError:
+            self._instance_errors = []
+            return self._instance_errors
 
     @property
     def doc_errors(self):
@@ -171,13 +394,19 @@ class Schema:
         :return: validation errors for every object in this object including
             self
         """
-        if self._doc_errors:
-            return self._doc_errors
+        errors = getattr(self, '_doc_errors', None)
+        if errors:
+            return errors
 
-        errors = self._instance_errors
-        for prop, val in vars(self).items():
-            if issubclass(type(val), Schema):
-                errors = errors + val.doc_errors
+        # walk the nested objects with an explicit stack in the same order as
+        # the attributes are set, so deep documents can't exhaust the stack
+        errors = []
+        objects = [self]
+        while objects:
+            obj = objects.pop()
+            errors.extend(getattr(obj, '_instance_errors', ()))
+            objects.extend(val for val in reversed(list(vars(obj).values()))
+                           if issubclass(type(val), Schema))
         self._doc_errors = errors
         return self._doc_errors
 
@@ -189,3 +418,62 @@ class Schema:
                 class_vars[k] = v
         class_vars.update(self.__dict__)
         return str(class_vars)
+
+
+def _coerce_value(value, coercer):
+    """
+    :param value: the value to coerce
+    :param coercer: the hinted type, the types which can be coerced and the
+        constructor to coerce with
+    :return: the coerced value, or the value itself if its type cannot be
+        coerced
+    """
+    type_, source_types, constructor = coercer
+    if type(value) is type_ or (source_types is not None and
+                                type(value) not in source_types):
+        return value
+    return constructor(value)
+
+
+def _construct_nested(type_hint, value):
+    """
+    :param type_hint: the type hint of the value
+    :param value: the value, constructed if it's the dict of a Schema object
+    :return: the constructed object, or the value itself if it isn't a dict
+        of a Schema class or a known member of a discriminated union
+    """
+    if type(value) is not dict:
+        return value
+    if is_union(type_hint):
+        nested = None
+        for member in type_hint.__args__:
+            discriminator = getattr(member, '_discriminator', None)
+            if discriminator and \
+                    value.get(discriminator[0]) == discriminator[1]:
+                nested = member
+                break
+    else:
+        nested = schema_type(type_hint)
+    return nested.construct(**value) if nested else value
+
+
+def _restore(cls, state: dict):
+    """
+    Restores a pickled `Schema` object without validation.
+    """
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+
+def schema_type(type_hint):
+    """
+    :param type_hint: the type hint to check
+    :return: the Schema class hinted by the type hint, optional or not, None
+        if the type hint isn't a Schema class
+    """
+    if is_optional(type_hint):
+        type_hint = type_hint.__args__[0]
+    if isinstance(type_hint, type) and issubclass(type_hint, Schema):
+        return type_hint
+    return None
@@ -1,6 +1,8 @@
+import array
 import functools
 import uuid
 
+from endorser.common import ARRAY_TYPECODES, is_typing_list
 from endorser.error import construct_error, ErrorNames
 
 
@@ -83,5 +85,69 @@ def valid_uuid(validation_field):
     return validator
 
 
+def compact_array(validation_field):
+    """
+    Stores a `typing.List[int]` or `typing.List[float]` value as an
+    `array.array` buffer instead of a list of boxed numbers.
+
+    Values which cannot be stored this way, including lists containing
+    bools, are passed on unchanged so the type validation reports them the
+    same way as for plain lists.
+    """
+
+    @functools.wraps(validation_field)
+    def validator(self, value):
+        prop_name = _get_property_name_from(validation_field)
+        type_hint = self._type_hints[prop_name]
+        element_type = type_hint.__args__[0] \
+            if is_typing_list(type_hint) else None
+        if element_type not in ARRAY_TYPECODES:
+            raise TypeError('compact_array only supports typing.List[int] '
+                            'and typing.List[float] fields, %s is hinted '
+                            'with %s' % (prop_name, type_hint))
+        if type(value) is list:
+            if set(map(type, value)) <= {element_type}:
+                try:
+                    value = array.array(ARRAY_TYPECODES[element_type], value)
+                except OverflowError:
+                    pass
+        return validation_field(self, value)
+
+    return validator
+
+
+def cost(value: int):
+    """
+    Sets the cost of a validation method. Objects instantiated with
+    `_fail_fast=True` run the cheaper validation methods first. Validation
+    methods without a cost have the cost 0. Has to be applied as the
+    outermost decorator.
+    """
+
+    def decorator(validation_field):
+        validation_field._validation_cost = value
+        return validation_field
+
+    return decorator
+
+
+def batch_validator(field_name: str):
+    """
+    Turns the function into a classmethod which validates the values of a
+    field of every instance converted by `DocumentConverter` at once.
+
+    The function receives the list of values and has to return a dict which
+    maps the index of the invalid values to their error. It can be a
+    coroutine function if the document is converted with
+    `DocumentConverter#convert_async`.
+    """
+
+    def decorator(validator_function):
+        validator_function._batch_validated_field = field_name
+        return classmethod(validator_function)
+
+    return decorator
+
+
 def _get_property_name_from(fn):
     return fn.__name__.split('_', 1)[1]
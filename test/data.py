@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from endorser import Schema
 
@@ -24,3 +24,36 @@ class ParentSchema(Schema):
 class InvalidSchema(Schema):
     invalid_prop = None
     str_prop: str
+
+
+class Node(Schema):
+    name: str
+    children: List['Node']
+
+
+class AliasedSchema(Schema):
+    _aliases = {'zip_code': 'ZIP'}
+
+    zip_code: str
+    house_number: int
+    custom_obj: Optional[CustomSchema]
+
+
+class ClickEvent(Schema):
+    _discriminator = 'type', 'click'
+
+    type: str
+    x: int
+    y: int
+
+
+class ScrollEvent(Schema):
+    _discriminator = 'type', 'scroll'
+
+    type: str
+    offset: int
+
+
+class Session(Schema):
+    events: List[Union[ClickEvent, ScrollEvent]]
+    last_event: Union[ClickEvent, ScrollEvent]
@@ -0,0 +1,145 @@
+import gc
+import mmap
+import pickle
+import tempfile
+import typing
+import unittest
+import uuid
+import weakref
+from decimal import Decimal
+
+from endorser import DocumentConverter, Schema, SchemaFactory
+from endorser.codec import SchemaCodec, codec_for, decode, encode
+from endorser.validator import compact_array
+from test.data import ParentSchema, Node, CustomSchema as DataCustomSchema
+
+
+class Measurement(Schema):
+    id: uuid.UUID
+    count: int
+    ratio: float
+    enabled: bool
+    price: Decimal
+    payload: bytes
+    samples: typing.List[float]
+    note: typing.Optional[str] = None
+
+    @compact_array
+    def validate_samples(self, value):
+        return value
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        self.converter = DocumentConverter()
+        self.parent = self.converter.convert({
+            'str_prop': 'text',
+            'int_prop': 3,
+            'list_prop': [1, 'a'],
+            'dict_prop': {'key': 'value'},
+            'custom_obj': {'str_prop': 'nested'},
+            'typed_list_prop': ['a', 'b'],
+            'typed_list_prop_with_custom_obj': [{'str_prop': 'x'}],
+        }, ParentSchema)
+
+    def test_round_trip(self):
+        obj = decode(encode(self.parent), ParentSchema)
+
+        self.assertIsInstance(obj, ParentSchema)
+        self.assertEqual(obj.str_prop, 'text')
+        self.assertEqual(obj.int_prop, 3)
+        self.assertEqual(obj.list_prop, [1, 'a'])
+        self.assertEqual(obj.dict_prop, {'key': 'value'})
+        self.assertEqual(obj.custom_obj.str_prop, 'nested')
+        self.assertEqual(obj.typed_list_prop, ['a', 'b'])
+        self.assertEqual(obj.typed_list_prop_with_custom_obj[0].str_prop, 'x')
+        self.assertEqual(obj.optional_with_default_value, 'def')
+        self.assertEqual(obj.doc_errors, [])
+
+    def test_round_trip_with_fixed_size_fields(self):
+        measurement = Measurement(id=uuid.uuid4(), count=-7, ratio=0.5,
+                                  enabled=True, price=Decimal('9.99'),
+                                  payload=b'\x00\x01', samples=[1.5, 2.5])
+        obj = decode(encode(measurement), Measurement)
+
+        for field in Measurement._type_hints:
+            self.assertEqual(getattr(obj, field), getattr(measurement, field))
+        self.assertEqual(obj.samples.typecode, 'd')
+        self.assertIsNone(obj.note)
+
+    def test_round_trip_with_optional_elements(self):
+
+        class Sparse(Schema):
+            counts: typing.List[typing.Optional[int]]
+            names: typing.List[typing.Optional[str]]
+
+        sparse = Sparse(counts=[1, None, 3], names=[None, 'a'])
+        obj = decode(encode(sparse), Sparse)
+
+        self.assertEqual(obj.counts, [1, None, 3])
+        self.assertEqual(obj.names, [None, 'a'])
+
+    def test_values_which_do_not_fit_their_encoding(self):
+
+        class Big(Schema):
+            n: int
+
+        class Sparse(Schema):
+            n: typing.Optional[int]
+            counts: typing.List[typing.Optional[int]]
+
+        with self.assertRaisesRegex(ValueError, '^n of Big'):
+            encode(Big.construct(n=2 ** 70))
+        with self.assertRaisesRegex(ValueError, '^n of Sparse'):
+            encode(Sparse.construct(n='abc', counts=None))
+        with self.assertRaisesRegex(ValueError, '^counts of Sparse'):
+            encode(Sparse.construct(n=None, counts=[None, 2 ** 70]))
+
+    def test_codec_does_not_keep_classes_alive(self):
+        factory = SchemaFactory(maxsize=1)
+        cls = factory.create('Cached', {'name': str})
+        encode(cls(name='value'))
+        ref = weakref.ref(cls)
+
+        del cls
+        factory.create('Other', {'name': str})
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_encoding_is_smaller_than_pickle(self):
+        self.assertLess(len(encode(self.parent)),
+                        len(pickle.dumps(self.parent)))
+
+    def test_recursive_schema(self):
+        node = self.converter.convert(
+            {'name': 'root', 'children': [{'name': 'leaf', 'children': []}]},
+            Node)
+        obj = decode(encode(node), Node)
+
+        self.assertEqual(obj.children[0].name, 'leaf')
+        self.assertEqual(obj.children[0].children, [])
+
+    def test_fingerprint(self):
+        class CustomSchema(Schema):
+            str_prop: int
+
+        self.assertEqual(codec_for(Node).fingerprint,
+                         SchemaCodec(Node).fingerprint)
+        self.assertNotEqual(codec_for(DataCustomSchema).fingerprint,
+                            SchemaCodec(CustomSchema).fingerprint)
+        with self.assertRaises(ValueError):
+            decode(encode(self.parent), Node)
+
+    def test_iter_decode(self):
+        nodes = [Node(name=str(i), children=[]) for i in range(3)]
+        with tempfile.TemporaryFile() as file:
+            file.write(b''.join(encode(node) for node in nodes))
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                names = [node.name for node in codec_for(Node).iter_decode(data)]
+
+        self.assertEqual(names, ['0', '1', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
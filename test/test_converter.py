@@ -1,9 +1,18 @@
+import asyncio
+import csv
+import io
+import sqlite3
 import unittest
-from typing import List
+from typing import List, Union
 
 from endorser import ConversionError
 from endorser import DocumentConverter
-from test.data import ParentSchema, InvalidSchema
+from endorser import Schema
+from endorser.error import construct_error
+from endorser.validator import batch_validator
+from endorser.common import camel_case
+from test.data import ParentSchema, InvalidSchema, Node, AliasedSchema, \
+    ClickEvent, ScrollEvent, Session
 
 
 class ConverterTest(unittest.TestCase):
@@ -78,3 +87,411 @@ class ConverterTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.converter.convert({'str_prop': 'str', 'invalid_prop': 123},
                                    InvalidSchema)
+
+    def test_converter_with_aggregated_errors(self):
+        converter = DocumentConverter(aggregate_errors=True,
+                                      error_sample_size=2)
+        data = []
+        for i in range(5):
+            document = dict(self.VALID_DOCUMENT, int_prop='string',
+                            custom_obj={'str_prop': self.A_STRING_2})
+            data.append(document)
+        data.insert(0, self.ANOTHER_DOCUMENT)
+
+        with self.assertRaises(ConversionError) as e:
+            converter.convert(data, List[ParentSchema])
+        self.assertEqual(1, len(e.exception.errors))
+        self.assertEqual(5, e.exception.errors[0]['count'])
+        self.assertEqual('int_prop', e.exception.errors[0]['field'])
+        self.assertEqual([1, 2], e.exception.errors[0]['indices'])
+        self.assertEqual(5, e.exception.summary.total)
+
+    def test_converter_with_aggregated_errors_and_valid_document(self):
+        converter = DocumentConverter(aggregate_errors=True)
+        data = [self.VALID_DOCUMENT, self.ANOTHER_DOCUMENT]
+        result = converter.convert(data, List[ParentSchema])
+
+        self.assertEqual(2, len(result))
+
+    def test_converter_with_self_referencing_schema(self):
+        data = {'name': 'root', 'children': [
+            {'name': 'child 1', 'children': []},
+            {'name': 'child 2', 'children': [
+                {'name': 'grandchild', 'children': []}]}]}
+        result = self.converter.convert(data, Node)
+
+        self.assertEqual(type(result.children[1]), Node)
+        self.assertEqual(result.children[0].name, 'child 1')
+        self.assertEqual(result.children[1].children[0].name, 'grandchild')
+
+    def test_converter_with_local_self_referencing_schema(self):
+
+        class Tree(Schema):
+            kids: List['Tree']
+
+        result = self.converter.convert({'kids': [{'kids': []}]}, Tree)
+
+        self.assertEqual(type(result.kids[0]), Tree)
+
+    def test_converter_with_unresolvable_forward_reference(self):
+
+        class Tree(Schema):
+            kids: List['Missing']
+
+        with self.assertRaises(NameError):
+            self.converter.convert({'kids': []}, Tree)
+
+    def test_converter_with_deep_document(self):
+        data = node = {'name': 'node 0', 'children': []}
+        for i in range(1, 5000):
+            child = {'name': 'node %d' % i, 'children': []}
+            node['children'].append(child)
+            node = child
+        result = self.converter.convert(data, Node)
+
+        for i in range(4999):
+            result = result.children[0]
+        self.assertEqual(result.name, 'node 4999')
+
+    def test_converter_with_max_depth_exceeded(self):
+        converter = DocumentConverter(max_depth=2)
+        data = {'name': 'root', 'children': [{'name': 'child', 'children': [
+            {'name': 'grandchild', 'children': []}]}]}
+
+        with self.assertRaises(ConversionError) as e:
+            converter.convert(data, Node)
+        self.assertEqual(e.exception.errors[0]['name'], 'MAX_DEPTH_EXCEEDED')
+
+    def test_converter_with_coercion(self):
+        converter = DocumentConverter(coerce=True)
+        self.VALID_DOCUMENT['int_prop'] = '123'
+        result = converter.convert(self.VALID_DOCUMENT, ParentSchema)
+
+        self.assertEqual(result.int_prop, 123)
+
+    def test_converter_with_batch_validator(self):
+        calls = []
+
+        class Item(Schema):
+            sku: str
+
+            @batch_validator('sku')
+            def validate_skus(cls, skus):
+                calls.append(skus)
+                return {i: construct_error('sku', 'unknown sku', cls.__name__,
+                                           name='UNKNOWN_SKU')
+                        for i, sku in enumerate(skus) if sku != 'known'}
+
+        data = [{'sku': 'known'}, {'sku': 'unknown'}, {'sku': 'known'}]
+        with self.assertRaises(ConversionError) as e:
+            self.converter.convert(data, List[Item])
+        self.assertEqual([['known', 'unknown', 'known']], calls)
+        self.assertEqual(1, len(e.exception.errors))
+        self.assertEqual('UNKNOWN_SKU', e.exception.errors[0]['name'])
+
+    def test_converter_with_batch_validator_and_aggregated_errors(self):
+        calls = []
+
+        class Item(Schema):
+            sku: str
+            count: int
+
+            @batch_validator('sku')
+            def validate_skus(cls, skus):
+                calls.append(skus)
+                return {i: construct_error('sku', 'unknown sku', cls.__name__,
+                                           name='UNKNOWN_SKU')
+                        for i, sku in enumerate(skus) if sku != 'known'}
+
+        converter = DocumentConverter(aggregate_errors=True)
+        data = [{'sku': 'known', 'count': 'x'}, {'sku': 'unknown', 'count': 1},
+                {'sku': 'known', 'count': 2}]
+        with self.assertRaises(ConversionError) as e:
+            converter.convert(data, List[Item])
+        # the item which failed already isn't kept for the batch validators
+        self.assertEqual([['unknown', 'known']], calls)
+        self.assertEqual({('count', 0), ('sku', 1)},
+                         {(error['field'], error['indices'][0])
+                          for error in e.exception.errors})
+
+    def test_converter_with_async_batch_validator(self):
+
+        class Item(Schema):
+            sku: str
+
+            @batch_validator('sku')
+            async def validate_skus(cls, skus):
+                return {i: construct_error('sku', 'unknown sku', cls.__name__,
+                                           name='UNKNOWN_SKU')
+                        for i, sku in enumerate(skus) if sku != 'known'}
+
+        data = [{'sku': 'known'}, {'sku': 'known'}]
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(
+                self.converter.convert_async(data, List[Item]))
+        finally:
+            loop.close()
+        self.assertEqual(2, len(result))
+
+        with self.assertRaises(TypeError):
+            self.converter.convert(data, List[Item])
+
+    def test_converter_with_budgets_exceeded(self):
+        budgets = [({'max_keys': 5}, 'MAX_KEYS_EXCEEDED'),
+                   ({'max_list_length': 3}, 'MAX_LIST_LENGTH_EXCEEDED'),
+                   ({'max_nodes': 10}, 'MAX_NODES_EXCEEDED'),
+                   ({'time_budget': -1}, 'TIME_BUDGET_EXCEEDED')]
+        for budget, name in budgets:
+            converter = DocumentConverter(**budget)
+            with self.assertRaises(ConversionError) as e:
+                converter.convert(dict(self.VALID_DOCUMENT), ParentSchema)
+            self.assertEqual(1, len(e.exception.errors))
+            self.assertEqual(name, e.exception.errors[0]['name'])
+
+    def test_converter_with_max_nodes_exceeded_by_list(self):
+
+        class Samples(Schema):
+            xs: List[int]
+
+        converter = DocumentConverter(max_nodes=100)
+        with self.assertRaises(ConversionError) as e:
+            converter.convert({'xs': list(range(1000))}, Samples)
+        self.assertEqual('MAX_NODES_EXCEEDED', e.exception.errors[0]['name'])
+
+        with self.assertRaises(ConversionError):
+            converter.convert([{'xs': []}] * 200, List[Samples])
+
+    def test_converter_within_budgets(self):
+        converter = DocumentConverter(max_depth=3, max_keys=10,
+                                      max_list_length=4, max_nodes=30,
+                                      time_budget=10)
+        result = converter.convert(self.VALID_DOCUMENT, ParentSchema)
+
+        self.assertEqual(result.str_prop, self.A_STRING)
+
+    def test_converter_with_csv(self):
+
+        class Row(Schema):
+            name: str
+            count: int
+
+        reader = csv.reader(io.StringIO('name,count\nfirst,1\nsecond,2\n'))
+        result = DocumentConverter(coerce=True).convert_csv(reader, Row)
+
+        self.assertEqual(2, len(result))
+        self.assertEqual('second', result[1].name)
+        self.assertEqual(2, result[1].count)
+
+    def test_converter_with_cursor(self):
+
+        class Row(Schema):
+            name: str
+            count: int
+
+        connection = sqlite3.connect(':memory:')
+        connection.execute('create table t (name text, count integer)')
+        connection.executemany('insert into t values (?, ?)',
+                               [('row %d' % i, i) for i in range(5)])
+        cursor = connection.execute('select name, count from t')
+        result = self.converter.convert_cursor(cursor, Row, batch_size=2)
+
+        self.assertEqual(5, len(result))
+        self.assertEqual('row 4', result[4].name)
+        self.assertEqual(4, result[4].count)
+
+        cursor = connection.execute("select name, 'x' as count from t")
+        with self.assertRaises(ConversionError) as e:
+            self.converter.convert_cursor(cursor, Row)
+        self.assertEqual(5, len(e.exception.errors))
+
+    def test_converter_with_unknown_column(self):
+        with self.assertRaises(ValueError):
+            self.converter.convert_rows([('a', 1)], ('str_prop', 'unknown'),
+                                        InvalidSchema)
+
+    def test_converter_with_sampling(self):
+        converter = DocumentConverter(sample_rate=0.25)
+        data = [dict(self.VALID_DOCUMENT, int_prop='invalid')
+                for _ in range(8)]
+
+        with self.assertRaises(ConversionError) as e:
+            converter.convert(data, List[ParentSchema])
+        self.assertEqual(2, len(e.exception.errors))
+        self.assertEqual(2, converter.sampling_stats.sampled)
+        self.assertEqual(1.0, converter.sampling_stats.error_rate)
+
+        data = [dict(self.VALID_DOCUMENT) for _ in range(8)]
+        result = converter.convert(data, List[ParentSchema])
+        self.assertEqual(8, len(result))
+        self.assertEqual(self.A_STRING_2, result[0].custom_obj.str_prop)
+        self.assertEqual(4, converter.sampling_stats.sampled)
+        self.assertEqual(0.5, converter.sampling_stats.error_rate)
+
+    def test_converter_with_sampling_and_coercion(self):
+        converter = DocumentConverter(sample_rate=0.5, coerce=True)
+        data = [dict(self.VALID_DOCUMENT, int_prop=str(i)) for i in range(4)]
+        result = converter.convert(data, List[ParentSchema])
+        self.assertEqual([0, 1, 2, 3], [obj.int_prop for obj in result])
+
+        class Row(Schema):
+            name: str
+            count: int
+
+        rows = [('text', str(i)) for i in range(4)]
+        result = converter.convert_rows(rows, ('name', 'count'), Row)
+        self.assertEqual([0, 1, 2, 3], [obj.count for obj in result])
+
+    def test_converter_with_aliased_columns(self):
+        with self.assertRaises(ConversionError) as e:
+            self.converter.convert_rows([(1234, 12)], ('ZIP', 'house_number'),
+                                        AliasedSchema)
+        self.assertEqual('zip_code', e.exception.errors[0]['field'])
+        self.assertEqual('ZIP', e.exception.errors[0]['alias'])
+
+    def test_converter_with_aliases(self):
+        converter = DocumentConverter(naming=camel_case)
+        data = {'ZIP': '1234', 'houseNumber': 12,
+                'customObj': {'strProp': self.A_STRING}}
+        result = converter.convert(data, AliasedSchema)
+
+        self.assertEqual(result.zip_code, '1234')
+        self.assertEqual(result.house_number, 12)
+        self.assertEqual(result.custom_obj.str_prop, self.A_STRING)
+
+        with self.assertRaises(ConversionError) as e:
+            converter.convert({'ZIP': 1234, 'houseNumber': 12},
+                              AliasedSchema)
+        self.assertEqual('zip_code', e.exception.errors[0]['field'])
+        self.assertEqual('ZIP', e.exception.errors[0]['alias'])
+
+        with self.assertRaises(ValueError):
+            converter.convert({'zipCode': '1234'}, AliasedSchema)
+
+        with self.assertRaises(ValueError):
+            converter.convert({'ZIP': '1234', 'zip_code': '5678',
+                               'houseNumber': 12}, AliasedSchema)
+
+    def test_converter_with_aliases_and_adopted_documents(self):
+        converter = DocumentConverter(naming=camel_case, adopt_documents=True)
+        data = {'ZIP': '1234', 'houseNumber': 12,
+                'customObj': {'strProp': self.A_STRING}}
+        result = converter.convert(data, AliasedSchema)
+
+        self.assertIs(vars(result), data)
+        self.assertEqual(result.zip_code, '1234')
+        self.assertEqual(result.house_number, 12)
+        self.assertEqual(result.custom_obj.str_prop, self.A_STRING)
+
+    def test_converter_with_duplicate_aliased_columns(self):
+        with self.assertRaises(ValueError):
+            self.converter.convert_rows([('1234', '5678')], ('ZIP', 'zip_code'),
+                                        AliasedSchema)
+
+    def test_converter_with_union(self):
+        click = {'type': 'click', 'x': 1, 'y': 2}
+        scroll = {'type': 'scroll', 'offset': 10}
+        result = self.converter.convert(
+            {'events': [click, scroll], 'last_event': dict(scroll)}, Session)
+
+        self.assertEqual(type(result.events[0]), ClickEvent)
+        self.assertEqual(type(result.events[1]), ScrollEvent)
+        self.assertEqual(type(result.last_event), ScrollEvent)
+
+        result = self.converter.convert(
+            [dict(click), dict(scroll)], List[Union[ClickEvent, ScrollEvent]])
+        self.assertEqual(type(result[0]), ClickEvent)
+        self.assertEqual(result[1].offset, 10)
+
+    def test_converter_with_unknown_union_member(self):
+        with self.assertRaises(ValueError) as e:
+            self.converter.convert([{'type': 'unknown'}],
+                                   List[Union[ClickEvent, ScrollEvent]])
+        self.assertIs(type(e.exception), ValueError)
+        with self.assertRaises(TypeError):
+            self.converter.convert([{'str_prop': 'value'}],
+                                   List[Union[ClickEvent, ParentSchema]])
+
+    def test_converter_with_union_of_plain_types(self):
+
+        class SchemaToTest(Schema):
+            value: Union[int, str]
+
+        with self.assertRaises(ConversionError) as e:
+            self.converter.convert({'value': {'key': 'value'}}, SchemaToTest)
+        self.assertEqual('WRONG_TYPE', e.exception.errors[0]['name'])
+
+    def test_converter_with_batch(self):
+        invalid = dict(self.ANOTHER_DOCUMENT, int_prop='invalid')
+        unknown = dict(self.ANOTHER_DOCUMENT, unknown_prop=1)
+        data = [self.VALID_DOCUMENT, invalid, unknown, 'not a dict',
+                self.ANOTHER_DOCUMENT]
+        result = self.converter.convert_batch(data, List[ParentSchema])
+
+        self.assertEqual(2, result.succeeded)
+        self.assertEqual(3, result.failed)
+        self.assertEqual(5, result.total)
+        self.assertEqual(self.A_STRING, result.items[0].str_prop)
+        self.assertEqual(self.A_STRING_3, result.items[1].str_prop)
+        self.assertEqual([1, 2, 3], [i for i, _ in result.failures])
+        self.assertEqual('int_prop', result.failures[0][1][0]['field'])
+        self.assertEqual('UNKNOWN_ATTRIBUTE',
+                         result.failures[1][1][0]['name'])
+        self.assertEqual('WRONG_TYPE', result.failures[2][1][0]['name'])
+
+    def test_converter_with_batch_and_unknown_union_member(self):
+        data = [{'type': 'unknown'}, {'type': 'scroll', 'offset': 1}]
+        result = self.converter.convert_batch(
+            data, List[Union[ClickEvent, ScrollEvent]])
+
+        self.assertEqual(1, result.succeeded)
+        self.assertEqual('UNKNOWN_DISCRIMINATOR',
+                         result.failures[0][1][0]['name'])
+
+    def test_converter_with_empty_batch(self):
+        result = self.converter.convert_batch([], List[ParentSchema])
+
+        self.assertEqual(0, result.total)
+        self.assertEqual([], result.items)
+
+    def test_converter_with_adopted_documents_and_new_attributes(self):
+
+        class SchemaToTest(Schema):
+            name: str
+
+            def validate_name(self, value):
+                self.cache = value.upper()
+                return value
+
+        converter = DocumentConverter(adopt_documents=True)
+        result = converter.convert({'name': 'value'}, SchemaToTest)
+
+        self.assertEqual(result.name, 'value')
+        self.assertEqual(result.cache, 'VALUE')
+
+    def test_converter_with_adopted_documents(self):
+        converter = DocumentConverter(adopt_documents=True)
+        document = self.VALID_DOCUMENT
+        result = converter.convert(document, ParentSchema)
+
+        self.assertIs(vars(result), document)
+        self.assertEqual(result.str_prop, self.A_STRING)
+        self.assertEqual(result.custom_obj.str_prop, self.A_STRING_2)
+        self.assertEqual(document['optional_with_default_value'], 'def')
+        self.assertIsNone(document['dict_prop'])
+        self.assertEqual(result.doc_errors, [])
+        self.assertNotIn('_instance_errors', document)
+
+        self.ANOTHER_DOCUMENT['int_prop'] = 'invalid'
+        with self.assertRaises(ConversionError) as e:
+            converter.convert(self.ANOTHER_DOCUMENT, ParentSchema)
+        self.assertEqual('int_prop', e.exception.errors[0]['field'])
+        self.assertNotIn('_instance_errors', self.ANOTHER_DOCUMENT)
+
+    def test_converter_with_adopted_documents_and_coercion(self):
+        converter = DocumentConverter(adopt_documents=True, coerce=True)
+        document = dict(self.VALID_DOCUMENT, int_prop='123')
+        result = converter.convert(document, ParentSchema)
+
+        self.assertIs(vars(result), document)
+        self.assertEqual(123, document['int_prop'])
@@ -0,0 +1,52 @@
+import gc
+import typing
+import unittest
+
+from endorser import DocumentConverter, SchemaFactory
+from endorser.common import camel_case
+
+
+class TestSchemaFactory(unittest.TestCase):
+    FIELDS = {
+        'name': str,
+        'count': typing.Optional[int],
+        'label': (typing.Optional[str], 'default'),
+    }
+
+    def setUp(self):
+        self.factory = SchemaFactory(maxsize=2)
+
+    def test_create(self):
+        cls = self.factory.create('Tenant', self.FIELDS)
+        obj = cls(name='some name')
+
+        self.assertEqual(obj.name, 'some name')
+        self.assertEqual(obj.label, 'default')
+        self.assertEqual(obj.doc_errors, [])
+        self.assertEqual(cls._mandatory_fields, ['name'])
+
+    def test_create_with_same_definition(self):
+        cls = self.factory.create('Tenant', self.FIELDS)
+
+        self.assertIs(cls, self.factory.create('Tenant', dict(self.FIELDS)))
+        self.assertIsNot(cls, self.factory.create('Tenant', {'name': str}))
+
+    def test_eviction(self):
+        converter = DocumentConverter(naming=camel_case)
+        first = self.factory.create('First', self.FIELDS)
+        converter.convert({'name': 'value'}, first)
+        self.assertEqual(1, len(converter._key_tables))
+
+        self.factory.create('Second', self.FIELDS)
+        self.factory.create('First', self.FIELDS)
+        self.factory.create('Third', self.FIELDS)
+        self.assertEqual(2, len(self.factory))
+        self.assertIs(first, self.factory.create('First', self.FIELDS))
+
+        self.factory.create('Fourth', self.FIELDS)
+        self.factory.create('Fifth', self.FIELDS)
+        self.assertIsNot(first, self.factory.create('First', self.FIELDS))
+
+        del first
+        gc.collect()
+        self.assertEqual(0, len(converter._key_tables))
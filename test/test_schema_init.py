@@ -1,9 +1,19 @@
+import array
+import datetime
+import decimal
+import enum
+import pickle
 import typing
 import unittest
+import uuid
 
+from endorser.common import _date_from_iso, _datetime_from_iso
+from endorser.error import construct_error
 from endorser.schema import Schema
+from endorser.validator import compact_array, cost, min_size
 
-from test.data import CustomSchema, ParentSchema
+from test.data import ClickEvent, CustomSchema, ParentSchema, \
+    ScrollEvent, Session
 
 
 class TestSchema(unittest.TestCase):
@@ -121,3 +131,225 @@ class TestSchema(unittest.TestCase):
         schema = SchemaToTest(prop=None)
 
         self.assertEqual(schema.prop, None)
+
+    def test_union_with_generic_member(self):
+
+        class SchemaToTest(Schema):
+            value: typing.Union[int, typing.List[int]]
+            values: typing.List[typing.Union[str, typing.List[str]]]
+
+        schema = SchemaToTest(value=[1], values=['a', ['b']])
+        self.assertEqual(schema.doc_errors, [])
+
+        schema = SchemaToTest(value='x', values=[1])
+        self.assertEqual([error['name'] for error in schema.doc_errors],
+                         ['WRONG_TYPE', 'WRONG_TYPE'])
+
+    def test_list_with_optional_elements(self):
+
+        class SchemaToTest(Schema):
+            counts: typing.List[typing.Optional[int]]
+
+        self.assertEqual(SchemaToTest(counts=[1, None]).doc_errors, [])
+        self.assertEqual(len(SchemaToTest(counts=[1, 'a']).doc_errors), 1)
+
+    def test_compact_array(self):
+
+        class SchemaToTest(Schema):
+            samples: typing.List[float]
+            counts: typing.List[int]
+
+            @compact_array
+            def validate_samples(self, value):
+                return value
+
+            @compact_array
+            def validate_counts(self, value):
+                return value
+
+        schema = SchemaToTest(samples=[1.5, 2.5], counts=[1, 2, 3])
+
+        self.assertEqual(schema.doc_errors, [])
+        self.assertEqual(type(schema.samples), array.array)
+        self.assertEqual(schema.samples.typecode, 'd')
+        self.assertEqual(list(schema.counts), [1, 2, 3])
+        self.assertEqual(memoryview(schema.counts).format, 'q')
+
+    def test_compact_array_with_wrong_type(self):
+
+        class SchemaToTest(Schema):
+            samples: typing.List[float]
+
+            @compact_array
+            def validate_samples(self, value):
+                return value
+
+        schema = SchemaToTest(samples=[1.5, 2])
+
+        self.assertEqual(type(schema.samples), list)
+        self.assertEqual(len(schema.doc_errors), 1)
+        self.assertEqual(schema.doc_errors[0]['field'], 'samples')
+        self.assertIn('index 1', schema.doc_errors[0]['error'])
+
+    def test_compact_array_with_bools(self):
+
+        class SchemaToTest(Schema):
+            flags: typing.List[int]
+
+            @compact_array
+            def validate_flags(self, value):
+                return value
+
+        schema = SchemaToTest(flags=[True, 2])
+
+        self.assertEqual(schema.flags, [True, 2])
+
+    def test_compact_array_with_unsupported_type(self):
+
+        class SchemaToTest(Schema):
+            names: typing.List[str]
+
+            @compact_array
+            def validate_names(self, value):
+                return value
+
+        with self.assertRaises(TypeError):
+            SchemaToTest(names=['a'])
+
+    def test_coercion(self):
+
+        class Color(enum.Enum):
+            RED = 'red'
+
+        class SchemaToTest(Schema):
+            id: uuid.UUID
+            count: int
+            price: decimal.Decimal
+            created: datetime.datetime
+            color: Color
+            ratio: typing.Optional[float]
+
+        schema = SchemaToTest(_coerce=True,
+                              id='7b4f95e3-4fbe-4f94-838f-c34950240274',
+                              count='12', price='1.50',
+                              created='2020-01-02T03:04:05', color='red',
+                              ratio=1)
+
+        self.assertEqual(schema.doc_errors, [])
+        self.assertEqual(type(schema.id), uuid.UUID)
+        self.assertEqual(schema.count, 12)
+        self.assertEqual(schema.price, decimal.Decimal('1.50'))
+        self.assertEqual(schema.created, datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertIs(schema.color, Color.RED)
+        self.assertEqual(type(schema.ratio), float)
+
+    def test_coercion_of_iso_strings_without_fromisoformat(self):
+        self.assertEqual(_datetime_from_iso('2020-01-02 03:04:05.5+01:00'),
+                         datetime.datetime(2020, 1, 2, 3, 4, 5, 500000,
+                                           tzinfo=datetime.timezone(
+                                               datetime.timedelta(hours=1))))
+        self.assertEqual(_date_from_iso('2020-01-02'),
+                         datetime.date(2020, 1, 2))
+        with self.assertRaises(ValueError):
+            _datetime_from_iso('2020-01-02T03')
+
+    def test_coercion_with_invalid_value(self):
+
+        class SchemaToTest(Schema):
+            count: int
+
+            def validate_count(self, value):
+                raise AssertionError('validation should be skipped')
+
+        schema = SchemaToTest(_coerce=True, count='twelve')
+
+        self.assertEqual(len(schema.doc_errors), 1)
+        self.assertEqual(schema.doc_errors[0]['name'], 'WRONG_TYPE')
+        self.assertEqual(schema.count, 'twelve')
+
+    def test_no_coercion_by_default(self):
+
+        class SchemaToTest(Schema):
+            count: int
+
+        schema = SchemaToTest(count='12')
+
+        self.assertEqual(len(schema.doc_errors), 1)
+        self.assertEqual(schema.count, '12')
+
+    def test_construct(self):
+        self.PROPERTIES['str_prop'] = 123
+        self.PROPERTIES['custom_obj'] = {'str_prop': self.str_prop_2}
+        self.PROPERTIES['typed_list_prop_with_custom_obj'] = [
+            {'str_prop': self.str_prop_3}]
+        schema = ParentSchema.construct(**self.PROPERTIES)
+
+        self.assertEqual(schema.str_prop, 123)
+        self.assertEqual(schema.doc_errors, [])
+        self.assertEqual(type(schema.custom_obj), CustomSchema)
+        self.assertEqual(schema.custom_obj.str_prop, self.str_prop_2)
+        self.assertEqual(
+            schema.typed_list_prop_with_custom_obj[0].str_prop,
+            self.str_prop_3)
+        self.assertEqual(schema.optional_with_default_value, 'def')
+
+        schema.custom_obj.instance_errors.append(
+            construct_error('str_prop', 'invalid', 'CustomSchema',
+                            name='INVALID'))
+        self.assertEqual(len(schema.doc_errors), 1)
+
+    def test_construct_with_union(self):
+        schema = Session.construct(
+            events=[{'type': 'click', 'x': 1, 'y': 2},
+                    {'type': 'scroll', 'offset': 3}],
+            last_event={'type': 'scroll', 'offset': 3})
+
+        self.assertEqual([ClickEvent, ScrollEvent],
+                         [type(event) for event in schema.events])
+        self.assertEqual(type(schema.last_event), ScrollEvent)
+        self.assertEqual(schema.last_event.offset, 3)
+
+    def test_pickle(self):
+        schema = ParentSchema(**self.PROPERTIES)
+        restored = pickle.loads(pickle.dumps(schema))
+
+        self.assertEqual(restored.str_prop, self.str_prop_1)
+        self.assertEqual(restored.custom_obj.str_prop, self.str_prop_2)
+        self.assertEqual(restored.doc_errors, [])
+        self.assertNotIn('_instance_errors', vars(restored))
+
+    def test_fail_fast(self):
+        validations = []
+
+        class SchemaToTest(Schema):
+            expensive: str
+            cheap: str
+
+            @cost(10)
+            def validate_expensive(self, value):
+                validations.append('expensive')
+                return value
+
+            @cost(1)
+            @min_size(3)
+            def validate_cheap(self, value):
+                validations.append('cheap')
+                return value
+
+        schema = SchemaToTest(_fail_fast=True, expensive='value',
+                              cheap='value')
+        self.assertEqual(schema.doc_errors, [])
+        self.assertEqual(validations, ['cheap', 'expensive'])
+
+        validations.clear()
+        schema = SchemaToTest(_fail_fast=True, expensive='value', cheap='x')
+        self.assertEqual(len(schema.doc_errors), 1)
+        self.assertEqual(validations, ['cheap'])
+
+        validations.clear()
+        schema = SchemaToTest(_fail_fast=True, expensive=123, cheap='value',
+                              unknown='value')
+        self.assertEqual(len(schema.doc_errors), 2)
+        self.assertEqual(schema.doc_errors[0]['field'], 'expensive')
+        self.assertEqual(schema.doc_errors[1]['name'], 'UNKNOWN_ATTRIBUTE')
+        self.assertEqual(validations, [])